@@ -4,6 +4,7 @@ from pathlib import Path
 import tomlkit
 from flask import (
     Flask,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -12,6 +13,7 @@ from flask import (
 )
 
 import utils.gui_utils as gui
+from utils.videos import load_done_videos
 
 HOST = "localhost"
 PORT = 4000
@@ -76,7 +78,8 @@ def settings():
 
 @app.route("/videos.json")
 def videos_json():
-    return send_from_directory("video_creation/data", "videos.json")
+    # The page still expects one JSON list, the log on disk is JSON Lines
+    return jsonify(load_done_videos())
 
 
 @app.route("/backgrounds.json")
@@ -1,33 +1,39 @@
 from collections import deque
 import re
-import json
 from pathlib import Path
 
 import praw
 from praw.models import MoreComments
 from prawcore.exceptions import ResponseException
 
+from TTS.engine_wrapper import DEFAULT_MAX_LENGTH
 from utils import settings
 from utils.console import print_step, print_substep
+from utils.json_io import JSONDecodeError, read_json, write_json
 from utils.posttextparser import posttextparser
 from utils.subreddit import get_subreddit_undone
+from utils.used_content_db import DB_PATH, add_used_for_thread, get_used_for_thread
 from utils.videos import check_done
 from utils.voice import sanitize_text
 
+try:
+    import ahocorasick
+except ImportError: # pyahocorasick is optional, contains_swear_word falls back to one precompiled regex
+    ahocorasick = None
+
 # --- Swear Word Filter --- 
 SWEAR_WORDS_PATH = Path("swear_words.json")
 LOADED_SWEAR_WORDS = []
 
 if SWEAR_WORDS_PATH.exists():
     try:
-        with open(SWEAR_WORDS_PATH, "r", encoding="utf-8") as f_swear:
-            LOADED_SWEAR_WORDS = json.load(f_swear)
-            if not isinstance(LOADED_SWEAR_WORDS, list):
-                print_substep(f"Warning: `{SWEAR_WORDS_PATH}` does not contain a valid list. Swear word filter disabled.", style="bold yellow")
-                LOADED_SWEAR_WORDS = []
-            else:
-                LOADED_SWEAR_WORDS = [str(word).lower() for word in LOADED_SWEAR_WORDS] # Normalize to lowercase
-    except json.JSONDecodeError:
+        LOADED_SWEAR_WORDS = read_json(SWEAR_WORDS_PATH)
+        if not isinstance(LOADED_SWEAR_WORDS, list):
+            print_substep(f"Warning: `{SWEAR_WORDS_PATH}` does not contain a valid list. Swear word filter disabled.", style="bold yellow")
+            LOADED_SWEAR_WORDS = []
+        else:
+            LOADED_SWEAR_WORDS = [str(word).lower() for word in LOADED_SWEAR_WORDS] # Normalize to lowercase
+    except JSONDecodeError:
         print_substep(f"Warning: Could not parse `{SWEAR_WORDS_PATH}`. Swear word filter disabled.", style="bold yellow")
         LOADED_SWEAR_WORDS = []
     except Exception as e:
@@ -36,17 +42,73 @@ if SWEAR_WORDS_PATH.exists():
 else:
     print_substep(f"Warning: `{SWEAR_WORDS_PATH}` not found. Swear word filter disabled.", style="bold yellow")
 
+def _build_swear_words_automaton(words: list):
+    """Builds a single Aho-Corasick automaton so every text is scanned once regardless of how many words are loaded."""
+    if not words or ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+def _build_swear_words_regex(words: list) -> re.Pattern | None:
+    """Compiles all words into one `\\b(?:w1|w2|...)\\b` alternation, longest first so longer words win."""
+    if not words:
+        return None
+    alternation = "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+    return re.compile(r"\b(?:" + alternation + r")\b", re.IGNORECASE)
+
+WORD_TOKEN_RE = re.compile(r"\w+")
+
+SWEAR_WORDS_AUTOMATON = _build_swear_words_automaton(LOADED_SWEAR_WORDS)
+if SWEAR_WORDS_AUTOMATON is None:
+    # Without the automaton, words made of a single `\w+` token are looked up in a set and only phrases go through the regex
+    SWEAR_SINGLE = frozenset(word for word in LOADED_SWEAR_WORDS if WORD_TOKEN_RE.fullmatch(word))
+    SWEAR_MULTI = [word for word in LOADED_SWEAR_WORDS if word not in SWEAR_SINGLE]
+else:
+    SWEAR_SINGLE = frozenset()
+    SWEAR_MULTI = []
+SWEAR_MULTI_RE = _build_swear_words_regex(SWEAR_MULTI)
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    """Mimics regex `\\b`: a boundary sits between a word and a non-word character (text edges count as non-word)."""
+    before = index > 0 and _is_word_char(text[index - 1])
+    after = index < len(text) and _is_word_char(text[index])
+    return before != after
+
 def contains_swear_word(text: str) -> str | None:
-    if not LOADED_SWEAR_WORDS or not text:
+    if not text:
         return None
     text_lower = str(text).lower()
-    # Use word boundaries to avoid matching substrings within words
-    for word in LOADED_SWEAR_WORDS:
-        if re.search(r"\b" + re.escape(word) + r"\b", text_lower):
+    if SWEAR_WORDS_AUTOMATON is None:
+        if SWEAR_SINGLE:
+            for token in WORD_TOKEN_RE.findall(text_lower):
+                if token in SWEAR_SINGLE:
+                    return token
+        if SWEAR_MULTI_RE is None:
+            return None
+        match = SWEAR_MULTI_RE.search(text_lower)
+        return match.group(0) if match else None
+    for end_index, word in SWEAR_WORDS_AUTOMATON.iter(text_lower):
+        start_index = end_index - len(word) + 1
+        # Check word boundaries to avoid matching substrings within words
+        if _is_word_boundary(text_lower, start_index) and _is_word_boundary(text_lower, end_index + 1):
             return word # Return the word that was found
     return None
 # --- End Swear Word Filter ---
 
+# Upper estimate of how fast TTS reads, so the character budget errs towards collecting too many comments
+SPOKEN_CHARS_PER_SECOND = 20
+COMMENT_CHAR_BUDGET = DEFAULT_MAX_LENGTH * SPOKEN_CHARS_PER_SECOND
+
+# Precompiled patterns used by get_subreddit_threads
+BRACKETED_TEXT_RE = re.compile(r'\[[^\]]*\]')
+SUBREDDIT_PREFIX_RE = re.compile(r"r\/")
+
 # --- Helper for Unsuitable Threads ---
 UNSUITABLE_THREADS_FILENAME = "unsuitable_threads.json"
 
@@ -62,8 +124,7 @@ def _save_unsuitable_thread_id(thread_id: str, data_path_dir: Path, unsuitable_i
         unsuitable_ids_list.sort() 
         try:
             data_path_dir.mkdir(parents=True, exist_ok=True) 
-            with open(path, "w", encoding="utf-8") as f_unsuitable:
-                json.dump(unsuitable_ids_list, f_unsuitable, indent=4)
+            write_json(path, unsuitable_ids_list)
             print_substep(f"Thread {thread_id} marked as unsuitable and ID saved to {path}.", style="yellow")
         except IOError as e:
             print_substep(f"Error saving unsuitable thread ID to {path}: {e}", style="bold red")
@@ -71,42 +132,82 @@ def _save_unsuitable_thread_id(thread_id: str, data_path_dir: Path, unsuitable_i
             print_substep(f"An unexpected error occurred while saving unsuitable thread ID to {path}: {e}", style="bold red")
 # --- End Helper ---
 
+def _get_comment_length_limits(settings_config: dict) -> tuple[int, int]:
+    """Returns (min_comment_length, max_comment_length) so callers can read them once per loop instead of per comment."""
+    thread_config = settings_config["reddit"]["thread"]
+    return int(thread_config["min_comment_length"]), int(thread_config["max_comment_length"])
+
+def _find_suitable_submission(threads: list, subreddit, unsuitable_thread_ids: list, data_dir: Path, storymode: bool, search_keywords: list | None = None, max_retries: int = 5):
+    """Returns the first undone submission from `threads` that passes the swear word filter (and, in storymode, mentions a search keyword).
+
+    Rejected submissions are saved as unsuitable and skipped on the next attempt without re-fetching `threads`.
+    Once `threads` is exhausted get_subreddit_undone falls back to the top listings on its own.
+    """
+    rejected_thread_ids = set()
+    for _ in range(max_retries): # Limit retries to avoid infinite loops
+        remaining_threads = [thread for thread in threads if thread.id not in rejected_thread_ids]
+        submission = get_subreddit_undone(remaining_threads, subreddit, unsuitable_thread_ids=unsuitable_thread_ids)
+        if submission is None: # No suitable post found by get_subreddit_undone
+            return None
+
+        rejection_reason = None
+        # Keyword check for storymode (title or selftext), only relevant when search_keywords are defined
+        if storymode and search_keywords and not any(
+            keyword.lower() in submission.title.lower() or keyword.lower() in submission.selftext.lower()
+            for keyword in search_keywords
+        ):
+            rejection_reason = f"Skipping post {submission.id} (storymode): Keywords '{', '.join(search_keywords)}' not found in title or selftext."
+        elif blocked_word_title := contains_swear_word(submission.title):
+            rejection_reason = f"Post skipped: Title contains a blocked word (\'{blocked_word_title}\'). ID: {submission.id}"
+        elif storymode and (blocked_word_content := contains_swear_word(submission.selftext)):
+            rejection_reason = f"Post skipped: Story content contains a blocked word (\'{blocked_word_content}\'). ID: {submission.id}"
+
+        if rejection_reason is None:
+            return submission # Found a suitable, non-filtered submission
+        print_substep(rejection_reason, style="yellow")
+        _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
+        rejected_thread_ids.add(submission.id)
+    return None
+
 # Add custom exception at the top of the file or within the function if it's only used locally
 class PrawFallbackNeeded(Exception):
     pass
 
-def _is_praw_comment_suitable_for_read_story(comment_obj: praw.models.Comment, used_comment_ids: set, settings_config: dict) -> bool:
+def _is_praw_comment_suitable_for_read_story(comment_obj: praw.models.Comment, used_comment_ids: set, min_len: int, max_len: int) -> bool:
     """Checks a PRAW Comment object for suitability for 'read_comment_as_story' mode."""
-    if comment_obj.stickied or comment_obj.body in ["[removed]", "[deleted]"]:
-        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Stickied or body \'{comment_obj.body}\'.", style="dim")
+    # Already used comments are rejected before any filter work is spent on their body
+    if comment_obj.id in used_comment_ids:
+        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): ID {comment_obj.id} already used.", style="dim")
         return False
 
-    sanitised_body = sanitize_text(comment_obj.body)
-    if not sanitised_body or sanitised_body.strip() == "":
-        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Empty after sanitization.", style="dim")
+    comment_body = comment_obj.body
+    actual_len = len(comment_body)
+    if not (min_len <= actual_len <= max_len):
+        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Length {actual_len} not in range ({min_len}-{max_len}).", style="dim")
         return False
-    
-    blocked_word = contains_swear_word(comment_obj.body)
+
+    if comment_body in ["[removed]", "[deleted]"] or comment_obj.stickied:
+        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Stickied or body \'{comment_body}\'.", style="dim")
+        return False
+
+    blocked_word = contains_swear_word(comment_body)
     if blocked_word:
         print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Contains blocked word \'{blocked_word}\'.", style="yellow")
         return False
 
-    min_len = int(settings_config["reddit"]["thread"]["min_comment_length"])
-    max_len = int(settings_config["reddit"]["thread"]["max_comment_length"])
-    actual_len = len(comment_obj.body)
-    if not (min_len <= actual_len <= max_len):
-        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Length {actual_len} not in range ({min_len}-{max_len}).", style="dim")
+    sanitised_body = sanitize_text(comment_body)
+    if not sanitised_body or sanitised_body.strip() == "":
+        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): Empty after sanitization.", style="dim")
         return False
-    
-    author_name = getattr(comment_obj.author, 'name', None)
-    if author_name is None or comment_obj.id in used_comment_ids:
-        reason = "author is None" if author_name is None else f"ID {comment_obj.id} already used"
-        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): {reason}.", style="dim")
+
+    # Author is checked last as accessing it may trigger a lazy fetch
+    if getattr(comment_obj.author, 'name', None) is None:
+        print_substep(f"Comment {comment_obj.id} skipped (PRAW suitability check): author is None.", style="dim")
         return False
         
     return True
 
-def _is_comment_dict_suitable_for_read_story(comment_dict: dict, used_comment_ids: set, settings_config: dict) -> bool:
+def _is_comment_dict_suitable_for_read_story(comment_dict: dict, used_comment_ids: set, min_len: int, max_len: int) -> bool:
     """Checks a comment dictionary (from keyword search) for suitability."""
     comment_body = comment_dict.get('body')
     comment_id = comment_dict.get('id')
@@ -117,30 +218,31 @@ def _is_comment_dict_suitable_for_read_story(comment_dict: dict, used_comment_id
         print_substep(f"Comment dict (ID: {comment_id if comment_id else 'Unknown'}) skipped: Missing body or ID.", style="dim")
         return False
 
+    if comment_id in used_comment_ids:
+        print_substep(f"Comment {comment_id} skipped (dict suitability check): ID {comment_id} already used.", style="dim")
+        return False
+
+    actual_len = len(comment_body)
+    if not (min_len <= actual_len <= max_len):
+        print_substep(f"Comment {comment_id} skipped (dict suitability check): Length {actual_len} not in range ({min_len}-{max_len}).", style="dim")
+        return False
+
     if is_stickied or comment_body in ["[removed]", "[deleted]"]:
         print_substep(f"Comment {comment_id} skipped (dict suitability check): Stickied or body \'{comment_body}\'.", style="dim")
         return False
 
-    sanitised_body = sanitize_text(comment_body)
-    if not sanitised_body or sanitised_body.strip() == "":
-        print_substep(f"Comment {comment_id} skipped (dict suitability check): Empty after sanitization.", style="dim")
-        return False
-    
     blocked_word = contains_swear_word(comment_body)
     if blocked_word:
         print_substep(f"Comment {comment_id} skipped (dict suitability check): Contains blocked word \'{blocked_word}\'.", style="yellow")
         return False
 
-    min_len = int(settings_config["reddit"]["thread"]["min_comment_length"])
-    max_len = int(settings_config["reddit"]["thread"]["max_comment_length"])
-    actual_len = len(comment_body)
-    if not (min_len <= actual_len <= max_len):
-        print_substep(f"Comment {comment_id} skipped (dict suitability check): Length {actual_len} not in range ({min_len}-{max_len}).", style="dim")
+    sanitised_body = sanitize_text(comment_body)
+    if not sanitised_body or sanitised_body.strip() == "":
+        print_substep(f"Comment {comment_id} skipped (dict suitability check): Empty after sanitization.", style="dim")
         return False
-    
-    if comment_author_name is None or comment_id in used_comment_ids:
-        reason = "author is None" if comment_author_name is None else f"ID {comment_id} already used"
-        print_substep(f"Comment {comment_id} skipped (dict suitability check): {reason}.", style="dim")
+
+    if comment_author_name is None:
+        print_substep(f"Comment {comment_id} skipped (dict suitability check): author is None.", style="dim")
         return False
         
     return True
@@ -148,6 +250,7 @@ def _is_comment_dict_suitable_for_read_story(comment_dict: dict, used_comment_id
 def _find_first_suitable_praw_comment_via_bfs(submission: praw.models.Submission, used_comment_ids: set, settings_config: dict) -> praw.models.Comment | None:
     """Performs BFS on submission comments to find the first suitable PRAW comment for read_comment_as_story."""
     MAX_COMMENTS_TO_SCAN = settings_config["reddit"]["thread"].get("max_comments_to_scan_for_keywords", 500)
+    min_len, max_len = _get_comment_length_limits(settings_config)
     MAX_TREE_NODES_TO_PROCESS = MAX_COMMENTS_TO_SCAN * 3 
     
     comments_actually_checked = 0
@@ -164,12 +267,11 @@ def _find_first_suitable_praw_comment_via_bfs(submission: praw.models.Submission
 
         if isinstance(item, praw.models.Comment):
             comments_actually_checked += 1
-            if _is_praw_comment_suitable_for_read_story(item, used_comment_ids, settings_config):
+            if _is_praw_comment_suitable_for_read_story(item, used_comment_ids, min_len, max_len):
                 print_substep(f"BFS scan: Found suitable PRAW comment {item.id} after checking {comments_actually_checked} comments.", style="green")
                 return item 
 
-            # If not suitable, add its replies to the queue
-            item.replies.replace_more(limit=0)
+            # If not suitable, add its replies to the queue. The replace_more(limit=0) above already pruned MoreComments from the whole tree.
             for reply in item.replies:
                 if processed_tree_nodes + len(queue) < MAX_TREE_NODES_TO_PROCESS:
                     queue.append(reply)
@@ -199,14 +301,16 @@ def _find_first_suitable_praw_comment_via_bfs(submission: praw.models.Submission
         
     return None
 
-def get_subreddit_threads(POST_ID: str):
-    """
-    Returns a list of threads from the AskReddit subreddit.
-    """
+_REDDIT_CLIENT = None
+
+def _get_reddit() -> praw.Reddit | None:
+    """Logs into Reddit on the first call and returns the same client for every later post in the queue."""
+    global _REDDIT_CLIENT
+    if _REDDIT_CLIENT is not None:
+        return _REDDIT_CLIENT
 
     print_substep("Logging into Reddit.")
 
-    content = {}
     if settings.config["reddit"]["creds"]["2fa"]:
         print("\nEnter your two-factor authentication code from your authenticator app.\n")
         code = input("> ")
@@ -219,7 +323,7 @@ def get_subreddit_threads(POST_ID: str):
     if str(username).casefold().startswith("u/"):
         username = username[2:]
     try:
-        reddit = praw.Reddit(
+        _REDDIT_CLIENT = praw.Reddit(
             client_id=settings.config["reddit"]["creds"]["client_id"],
             client_secret=settings.config["reddit"]["creds"]["client_secret"],
             user_agent="Accessing Reddit threads",
@@ -232,51 +336,35 @@ def get_subreddit_threads(POST_ID: str):
             print("Invalid credentials - please check them in config.toml")
     except:
         print("Something went wrong...")
+    return _REDDIT_CLIENT
+
+def get_subreddit_threads(POST_ID: str):
+    """
+    Returns a list of threads from the AskReddit subreddit.
+    """
+
+    reddit = _get_reddit()
+    content = {}
 
     # Ask user for subreddit input
     print_step("Getting subreddit threads...")
 
+    storymode = settings.config["settings"]["storymode"]
+
     # Paths for data files
     data_dir = Path("video_creation/data")
-    used_comments_path = data_dir / "used_comments.json"
     unsuitable_threads_path = data_dir / UNSUITABLE_THREADS_FILENAME
 
-    # Load used comment data (thread_id -> list of comment_ids)
-    used_comments_data = {}
-
-    if used_comments_path.exists():
-        try:
-            with open(used_comments_path, "r", encoding="utf-8") as f:
-                loaded_json = json.load(f)
-                if isinstance(loaded_json, dict):
-                    used_comments_data = loaded_json
-                else:
-                    print_substep(f"`{used_comments_path}` was not a dictionary. Initializing for thread-specific comment tracking.", style="bold yellow")
-                    data_dir.mkdir(parents=True, exist_ok=True)
-                    with open(used_comments_path, "w", encoding="utf-8") as f_write:
-                        json.dump({}, f_write) # Overwrite with new empty dict structure
-        except json.JSONDecodeError:
-            print_substep(f"`{used_comments_path}` was corrupted. Initializing for thread-specific comment tracking.", style="bold yellow")
-            data_dir.mkdir(parents=True, exist_ok=True)
-            with open(used_comments_path, "w", encoding="utf-8") as f_write:
-                json.dump({}, f_write) # Overwrite with new empty dict structure
-    else:
-        data_dir.mkdir(parents=True, exist_ok=True)
-        with open(used_comments_path, "w", encoding="utf-8") as f_write:
-            json.dump({}, f_write)
-        print_substep(f"`{used_comments_path}` not found. Created for thread-specific comment tracking.", style="bold yellow")
-
     # Load unsuitable thread IDs
     unsuitable_thread_ids = []
     if unsuitable_threads_path.exists():
         try:
-            with open(unsuitable_threads_path, "r", encoding="utf-8") as f_unsuitable:
-                loaded_json = json.load(f_unsuitable)
-                if isinstance(loaded_json, list):
-                    unsuitable_thread_ids = loaded_json
-                else:
-                    print_substep(f"Warning: `{unsuitable_threads_path}` does not contain a valid list. Initializing anew.", style="bold yellow")
-        except json.JSONDecodeError:
+            loaded_json = read_json(unsuitable_threads_path)
+            if isinstance(loaded_json, list):
+                unsuitable_thread_ids = loaded_json
+            else:
+                print_substep(f"Warning: `{unsuitable_threads_path}` does not contain a valid list. Initializing anew.", style="bold yellow")
+        except JSONDecodeError:
             print_substep(f"Warning: Could not parse `{unsuitable_threads_path}`. Initializing anew.", style="bold yellow")
         except Exception as e: # Catch other potential errors like permission issues
             print_substep(f"Warning: Error loading `{unsuitable_threads_path}`: {e}. Initializing anew.", style="bold yellow")
@@ -287,7 +375,7 @@ def get_subreddit_threads(POST_ID: str):
     ]:  # note to user. you can have multiple subreddits via reddit.subreddit("redditdev+learnpython")
         try:
             subreddit = reddit.subreddit(
-                re.sub(r"r\/", "", input("What subreddit would you like to pull from? "))
+                SUBREDDIT_PREFIX_RE.sub("", input("What subreddit would you like to pull from? "))
                 # removes the r/ from the input
             )
         except ValueError:
@@ -312,102 +400,37 @@ def get_subreddit_threads(POST_ID: str):
     else:
         search_keywords = settings.config["reddit"]["thread"].get("search_keywords")
         if search_keywords:
+            # One OR-joined search request instead of one request per keyword
+            combined_query = " OR ".join(f'"{keyword}"' for keyword in search_keywords)
+            print_substep(f"Searching for keywords: {combined_query} in subreddit r/{subreddit}")
             threads = []
-            for keyword in search_keywords:
-                print_substep(f"Searching for keyword: '{keyword}' in subreddit r/{subreddit_choice}")
-                threads.extend(list(subreddit.search(keyword, limit=10))) # Limit to 10 results per keyword
+            seen_thread_ids = set()
+            for thread in subreddit.search(combined_query, limit=10 * len(search_keywords)): # Keep the 10 results per keyword budget
+                if thread.id not in seen_thread_ids:
+                    seen_thread_ids.add(thread.id)
+                    threads.append(thread)
             if not threads:
                 print_substep("No posts found for the given keywords.", style="bold red")
                 return None
-            # --- Swear Word Filter: Added loop to retry if submission is filtered ---
-            max_retries = 5 # Limit retries to avoid infinite loops
-            for _ in range(max_retries):
-                submission = get_subreddit_undone(threads, subreddit, unsuitable_thread_ids=unsuitable_thread_ids)
-                if submission is None: # No suitable post found by get_subreddit_undone
-                    print_substep("No suitable post found from keyword search results after checking undone status.", style="bold red")
-                    return None # Changed from break to return None
-                
-                # Keyword check for storymode (title or selftext)
-                if settings.config["settings"]["storymode"] and search_keywords:
-                    keyword_found_in_post = False
-                    for keyword in search_keywords:
-                        if keyword.lower() in submission.title.lower() or keyword.lower() in submission.selftext.lower():
-                            keyword_found_in_post = True
-                            break
-                    if not keyword_found_in_post:
-                        print_substep(f"Skipping post {submission.id} (storymode): Keywords '{', '.join(search_keywords)}' not found in title or selftext.", style="yellow")
-                        _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
-                        submission = None # Mark for retry / skip
-                        # Potentially refresh 'threads' or fetch new ones if all keyword-based results are exhausted by this check.
-                        # For now, just continue to the next submission in the 'threads' list via get_subreddit_undone in the next iteration.
-                        # If 'threads' is exhausted, get_subreddit_undone will return None, handled above.
-                        continue # Try next submission from the 'threads' list
-
-                title_to_check = submission.title
-                content_to_check = submission.selftext if settings.config["settings"]["storymode"] else ""
-                
-                blocked_word_title = contains_swear_word(title_to_check)
-                if blocked_word_title:
-                    print_substep(f"Post skipped: Title contains a blocked word (\'{blocked_word_title}\'). ID: {submission.id}", style="yellow")
-                    _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
-                    submission = None # Mark for retry / skip
-                    # threads = subreddit.hot(limit=25) # Refresh threads for next attempt - Not for keyword search path
-                    continue
-                
-                if settings.config["settings"]["storymode"] and contains_swear_word(content_to_check):
-                    print_substep(f"Post skipped: Story content contains a blocked word. ID: {submission.id}", style="yellow")
-                    _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
-                    submission = None # Mark for retry / skip
-                    # threads = subreddit.hot(limit=25) # Refresh threads for next attempt - Not for keyword search path
-                    continue
-                
-                break # Found a suitable, non-filtered submission
-            # --- End Swear Word Filter Modification ---
+            submission = _find_suitable_submission(threads, subreddit, unsuitable_thread_ids, data_dir, storymode, search_keywords)
+            if submission is None:
+                print_substep("No suitable post found from keyword search results after checking undone status.", style="bold red")
+                return None
         else:
-            threads = subreddit.hot(limit=25)
-            # --- Swear Word Filter: Added loop to retry if submission is filtered ---
-            max_retries = 5 # Limit retries to avoid infinite loops
-            for _ in range(max_retries):
-                submission = get_subreddit_undone(threads, subreddit, unsuitable_thread_ids=unsuitable_thread_ids)
-                if submission is None: # No suitable post found by get_subreddit_undone
-                    break # Ensures this line remains break
-                
-                # Keyword check for storymode (title or selftext) - This part is for non-keyword search, so it is NOT added here.
-                # The check is only relevant when search_keywords are defined.
-
-                title_to_check = submission.title
-                content_to_check = submission.selftext if settings.config["settings"]["storymode"] else ""
-                
-                blocked_word_title = contains_swear_word(title_to_check)
-                if blocked_word_title:
-                    print_substep(f"Post skipped: Title contains a blocked word (\'{blocked_word_title}\'). ID: {submission.id}", style="yellow")
-                    _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
-                    submission = None # Mark for retry / skip
-                    threads = subreddit.hot(limit=25) # Refresh threads for next attempt
-                    continue
-                
-                if settings.config["settings"]["storymode"]:
-                    blocked_word_content = contains_swear_word(content_to_check)
-                    if blocked_word_content:
-                        print_substep(f"Post skipped: Story content contains a blocked word (\'{blocked_word_content}\'). ID: {submission.id}", style="yellow")
-                        _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
-                        submission = None # Mark for retry / skip
-                        threads = subreddit.hot(limit=25) # Refresh threads for next attempt
-                        continue
-                
-                break # Found a suitable, non-filtered submission
-            # --- End Swear Word Filter Modification ---
+            # Fetch the candidate pool once; _find_suitable_submission walks it in memory instead of re-querying hot.
+            threads = list(subreddit.hot(limit=100))
+            submission = _find_suitable_submission(threads, subreddit, unsuitable_thread_ids, data_dir, storymode)
 
     if submission is None:
         print_substep("Could not find a suitable post after checking all time filters.", style="bold red")
         return None # Propagate None if no submission is found
     
     # NEW: Check if thread is known unsuitable and storymode is false
-    if not settings.config["settings"]["storymode"] and submission.id in unsuitable_thread_ids:
+    if not storymode and submission.id in unsuitable_thread_ids:
         return None
 
     # Early check for no comments if not in storymode
-    if not settings.config["settings"]["storymode"] and not submission.num_comments:
+    if not storymode and not submission.num_comments:
         print_substep(f"Thread {submission.id} has 0 comments. Marking as unsuitable and skipping.", style="bold red")
         _save_unsuitable_thread_id(submission.id, data_dir, unsuitable_thread_ids)
         return None
@@ -416,7 +439,7 @@ def get_subreddit_threads(POST_ID: str):
     original_submission_before_check = submission 
     submission_was_already_done = False
 
-    if settings.config["settings"]["storymode"]:
+    if storymode:
         submission = check_done(submission)  # storymode always respects videos.json
         if submission is None: # check_done might return None if post was already done and not overridden
             return None # check_done will print the reason
@@ -431,7 +454,7 @@ def get_subreddit_threads(POST_ID: str):
     # MOVED BLOCK: Initialize these after all submission validity checks
     # submission object is guaranteed to be valid here if we haven't returned None
     current_thread_id = submission.id
-    used_comment_ids_for_this_thread = set(used_comments_data.get(current_thread_id, []))
+    used_comment_ids_for_this_thread = get_used_for_thread(current_thread_id)
     # END MOVED BLOCK
 
     upvotes = submission.score
@@ -441,7 +464,7 @@ def get_subreddit_threads(POST_ID: str):
 
     # Remove text within square brackets from the title
     original_title = submission.title
-    cleaned_title = re.sub(r'\[[^\]]*\]', '', original_title).strip()
+    cleaned_title = BRACKETED_TEXT_RE.sub('', original_title).strip()
 
     print_substep(f"Video will be: {cleaned_title} :thumbsup:", style="bold green")
     print_substep(f"Thread url is: {threadurl} :thumbsup:", style="bold green")
@@ -463,7 +486,7 @@ def get_subreddit_threads(POST_ID: str):
     content["parsed_story_content"] = [] # Initialize new key
     content["audio_segments"] = []    # Initialize new key
 
-    if settings.config["settings"]["storymode"]:
+    if storymode:
         if settings.config["settings"]["storymodemethod"] == 1:
             # Get parsed content with audio_text and visual_chunks
             parsed_data = posttextparser(submission.selftext)
@@ -503,8 +526,7 @@ def get_subreddit_threads(POST_ID: str):
                 if isinstance(item, praw.models.Comment):
                     temp_comments_to_check_praw.append(item)
                     comments_collected_by_bfs +=1
-                    # Add replies to queue
-                    item.replies.replace_more(limit=0)
+                    # Add replies to queue (MoreComments were already pruned from the whole tree)
                     for reply in item.replies:
                         if processed_tree_nodes + len(queue) < MAX_TREE_NODES_TO_PROCESS: queue.append(reply)
                         else: break
@@ -522,10 +544,12 @@ def get_subreddit_threads(POST_ID: str):
             elif processed_tree_nodes >= MAX_TREE_NODES_TO_PROCESS: print_substep(f"PRAW BFS (keyword search): Reached tree processing limit. Collected {len(temp_comments_to_check_praw)} comments.", style="yellow")
             print_substep(f"PRAW BFS (keyword search): Finished. Collected {len(temp_comments_to_check_praw)} comments (processed {processed_tree_nodes} tree items). Filtering by keyword...", style="dim")
 
+            lowered_keywords = [keyword.lower() for keyword in search_keywords]
             for comment_object in temp_comments_to_check_praw:
                 comment_body_text = getattr(comment_object, 'body', None)
                 if comment_body_text and isinstance(comment_body_text, str):
-                    if any(keyword.lower() in comment_body_text.lower() for keyword in search_keywords):
+                    comment_body_lower = comment_body_text.lower()
+                    if any(keyword in comment_body_lower for keyword in lowered_keywords):
                         keyword_matched_comments_list.append({
                             'body': comment_object.body,
                             'id': comment_object.id,
@@ -546,8 +570,9 @@ def get_subreddit_threads(POST_ID: str):
 
             if performing_keyword_comment_search:
                 # keyword_matched_comments_list has dicts. Find first suitable among them.
+                min_len, max_len = _get_comment_length_limits(settings.config)
                 for comment_dict_candidate in keyword_matched_comments_list:
-                    if _is_comment_dict_suitable_for_read_story(comment_dict_candidate, used_comment_ids_for_this_thread, settings.config):
+                    if _is_comment_dict_suitable_for_read_story(comment_dict_candidate, used_comment_ids_for_this_thread, min_len, max_len):
                         suitable_comment_for_story = comment_dict_candidate
                         break 
             else:
@@ -599,47 +624,66 @@ def get_subreddit_threads(POST_ID: str):
                 return None
         
         else: # Standard comment processing (not read_comment_as_story)
-            # Ensure all comments are loaded if not already a list
-            comments_for_standard_processing = []
-            if not isinstance(submission.comments, list):
-                submission.comments.replace_more(limit=None) # Loads all comments.
-                comments_for_standard_processing = submission.comments.list()
-            else:
-                comments_for_standard_processing = submission.comments
-                
-            for comment in comments_for_standard_processing:
-                if isinstance(comment, MoreComments):
-                    continue
-                if comment.body in ["[removed]", "[deleted]"] or comment.stickied:
-                    print_substep(f"Comment {comment.id} skipped: Body is '{comment.body}' or comment is stickied.", style="dim")
-                    continue
-
-                sanitised_body = sanitize_text(comment.body)
-                blocked_word = contains_swear_word(comment.body)
-                if blocked_word:
-                    print_substep(f"Comment skipped (standard): Contains a blocked word ('{blocked_word}'). ID: {comment.id}", style="yellow")
-                    continue
-                if not sanitised_body or sanitised_body == " ":
-                    print_substep(f"Comment {comment.id} skipped: Empty after sanitization.", style="dim")
-                    continue
-
-                min_len = int(settings.config["reddit"]["thread"]["min_comment_length"])
-                max_len = int(settings.config["reddit"]["thread"]["max_comment_length"])
-                actual_len = len(comment.body)
-                if not (min_len <= actual_len <= max_len):
-                    print_substep(f"Comment {comment.id} skipped: Length {actual_len} is outside range ({min_len}-{max_len}).", style="dim")
-                    continue
-                if comment.author is None or comment.id in used_comment_ids_for_this_thread:
-                    reason = "author is None" if comment.author is None else f"comment ID {comment.id} already used"
-                    print_substep(f"Comment {comment.id} skipped: {reason}.", style="dim")
-                    continue
-                
-                content["comments"].append({
-                    "comment_body": comment.body,
-                    "comment_url": comment.permalink,
-                    "comment_id": comment.id,
-                })
-            
+            # First scan only the comments that came with the initial thread fetch (MoreComments stubs are skipped).
+            # The remaining stubs are only expanded, which costs one API request each, if that did not yield enough comments.
+            # Scanning stops once the collected bodies are more than TTSEngine will read (it stops at max_length seconds),
+            # or at max_comments_for_video comments when that is set
+            max_comments_for_video = int(settings.config["settings"].get("max_comments_for_video", 0))
+            min_len, max_len = _get_comment_length_limits(settings.config)
+            scanned_comment_ids = set()
+            collected_chars = 0
+
+            def have_enough_comments() -> bool:
+                if max_comments_for_video and len(content["comments"]) >= max_comments_for_video:
+                    return True
+                return collected_chars >= COMMENT_CHAR_BUDGET
+
+            for load_all_comments in (False, True):
+                if load_all_comments:
+                    if have_enough_comments():
+                        break
+                    print_substep(f"Found {len(content['comments'])} suitable comments ({collected_chars} characters) in the loaded tree. Loading the remaining comments...", style="dim")
+                    submission.comments.replace_more(limit=None) # Loads all comments.
+
+                for comment in submission.comments.list():
+                    if have_enough_comments():
+                        break
+                    if isinstance(comment, MoreComments) or comment.id in scanned_comment_ids:
+                        continue
+                    scanned_comment_ids.add(comment.id)
+                    if comment.id in used_comment_ids_for_this_thread:
+                        print_substep(f"Comment {comment.id} skipped: comment ID {comment.id} already used.", style="dim")
+                        continue
+                    # Cheapest checks first: sanitize_text and the lazily fetched author are only touched for comments that pass everything else
+                    comment_body = comment.body
+                    actual_len = len(comment_body)
+                    if not (min_len <= actual_len <= max_len):
+                        print_substep(f"Comment {comment.id} skipped: Length {actual_len} is outside range ({min_len}-{max_len}).", style="dim")
+                        continue
+                    if comment_body in ["[removed]", "[deleted]"] or comment.stickied:
+                        print_substep(f"Comment {comment.id} skipped: Body is '{comment_body}' or comment is stickied.", style="dim")
+                        continue
+
+                    blocked_word = contains_swear_word(comment_body)
+                    if blocked_word:
+                        print_substep(f"Comment skipped (standard): Contains a blocked word ('{blocked_word}'). ID: {comment.id}", style="yellow")
+                        continue
+                    sanitised_body = sanitize_text(comment_body)
+                    if not sanitised_body or sanitised_body.isspace():
+                        print_substep(f"Comment {comment.id} skipped: Empty after sanitization.", style="dim")
+                        continue
+
+                    if comment.author is None:
+                        print_substep(f"Comment {comment.id} skipped: author is None.", style="dim")
+                        continue
+
+                    content["comments"].append({
+                        "comment_body": comment_body,
+                        "comment_url": comment.permalink,
+                        "comment_id": comment.id,
+                    })
+                    collected_chars += actual_len
+
             if not content["comments"]:
                 print_substep(f"No suitable comments found for thread {current_thread_id} after standard processing. Skipping post.", style="bold red")
                 if submission_was_already_done:
@@ -649,27 +693,16 @@ def get_subreddit_threads(POST_ID: str):
 
     print_substep("Received subreddit threads Successfully.", style="bold green")
 
-    if not settings.config["settings"]["storymode"] and content["comments"]:
+    if not storymode and content["comments"]:
         newly_processed_comment_ids = {comment["comment_id"] for comment in content["comments"]}
-        master_list_for_thread = set(used_comments_data.get(current_thread_id, []))
-        updated_used_ids_for_thread = master_list_for_thread.union(newly_processed_comment_ids)
-        
-        if updated_used_ids_for_thread:
-            used_comments_data[current_thread_id] = sorted(list(updated_used_ids_for_thread))
-            data_dir.mkdir(parents=True, exist_ok=True)
-            with open(used_comments_path, "w", encoding="utf-8") as f:
-                json.dump(used_comments_data, f, indent=4)
-            
-            num_actually_newly_saved = len(newly_processed_comment_ids - master_list_for_thread)
-            if num_actually_newly_saved > 0:
-                print_substep(f"Saved {num_actually_newly_saved} new comment ID(s) for thread {current_thread_id} to {used_comments_path}.", style="bold blue")
-            elif newly_processed_comment_ids: # This means num_actually_newly_saved is 0, but there were comments processed (they were all old)
-                print_substep(f"All processed comments for thread {current_thread_id} were already in {used_comments_path}. Marking as unsuitable.", style="bold blue")
-                _save_unsuitable_thread_id(current_thread_id, data_dir, unsuitable_thread_ids) # Add to unsuitable if all comments were old
-                return None # Skip the post
-            elif not newly_processed_comment_ids and submission_was_already_done:
-                 print_substep(f"Post {current_thread_id} was in videos.json and no new usable comments were found this time. Skipping save for videos.json to avoid re-logging without new content.", style="yellow")
-                 _save_unsuitable_thread_id(current_thread_id, data_dir, unsuitable_thread_ids) # Also mark as unsuitable here
-                 return None 
+        new_ids_for_thread = newly_processed_comment_ids - used_comment_ids_for_this_thread
+
+        if new_ids_for_thread:
+            add_used_for_thread(current_thread_id, new_ids_for_thread)
+            print_substep(f"Saved {len(new_ids_for_thread)} new comment ID(s) for thread {current_thread_id} to {DB_PATH}.", style="bold blue")
+        else: # All processed comments were already recorded for this thread
+            print_substep(f"All processed comments for thread {current_thread_id} were already in {DB_PATH}. Marking as unsuitable.", style="bold blue")
+            _save_unsuitable_thread_id(current_thread_id, data_dir, unsuitable_thread_ids) # Add to unsuitable if all comments were old
+            return None # Skip the post
 
     return content
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Let `pytest` run from anywhere and still import the bot's top-level packages
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
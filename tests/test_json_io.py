@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from utils import json_io
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    """Runs a test with orjson when it is installed and with the stdlib fallback."""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_io, "orjson", None)
+    return request.param
+
+
+def test_write_json_round_trip(tmp_path, backend):
+    path = tmp_path / "data.json"
+    data = {"name": "café", "ids": [1, 2, 3]}
+
+    json_io.write_json(path, data)
+
+    assert json_io.read_json(path) == data
+    assert json.loads(path.read_text(encoding="utf-8")) == data
+    assert not (tmp_path / "data.json.tmp").exists()
+
+
+def test_write_json_replaces_existing_file(tmp_path, backend):
+    path = tmp_path / "data.json"
+    json_io.write_json(path, {"version": 1, "padding": "x" * 1000})
+
+    json_io.write_json(path, {"version": 2})
+
+    assert json_io.read_json(path) == {"version": 2}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_json_keeps_old_file_when_replace_fails(tmp_path, monkeypatch, backend):
+    path = tmp_path / "data.json"
+    json_io.write_json(path, {"version": 1})
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json_io.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        json_io.write_json(path, {"version": 2})
+
+    assert json_io.read_json(path) == {"version": 1}
+
+
+def test_write_json_compact(tmp_path, backend):
+    path = tmp_path / "data.json"
+
+    json_io.write_json(path, {"a": [1, 2]}, indent=False)
+
+    assert path.read_text(encoding="utf-8").count("\n") == 1
+
+
+def test_write_json_lines_round_trip(tmp_path, backend):
+    path = tmp_path / "log.jsonl"
+    records = [{"id": "a"}, {"id": "b", "title": "ünïcode"}]
+
+    json_io.write_json_lines(path, records)
+
+    lines = path.read_bytes().splitlines()
+    assert [json_io.loads(line) for line in lines] == records
+    assert not (tmp_path / "log.jsonl.tmp").exists()
+
+
+def test_append_json_line(tmp_path, backend):
+    path = tmp_path / "log.jsonl"
+
+    json_io.append_json_line(path, {"id": "a"})
+    json_io.append_json_line(path, {"id": "b"})
+
+    assert [json_io.loads(line) for line in path.read_bytes().splitlines()] == [
+        {"id": "a"},
+        {"id": "b"},
+    ]
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from utils import used_content_db
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Points the module at a database and legacy file under tmp_path, with no connection open yet."""
+    monkeypatch.setattr(used_content_db, "DB_PATH", tmp_path / "data" / "used_content.db")
+    monkeypatch.setattr(
+        used_content_db, "LEGACY_JSON_PATH", tmp_path / "data" / "used_comments.json"
+    )
+    monkeypatch.setattr(used_content_db, "_connection", None)
+    yield used_content_db
+    if used_content_db._connection is not None:
+        used_content_db._connection.close()
+
+
+def test_round_trip(db):
+    assert db.get_used_for_thread("abc") == set()
+
+    assert db.add_used_for_thread("abc", {"c1", "c2"}) == 2
+    assert db.add_used_for_thread("xyz", {"c1"}) == 1
+
+    assert db.get_used_for_thread("abc") == {"c1", "c2"}
+    assert db.get_used_for_thread("xyz") == {"c1"}
+
+
+def test_add_counts_only_new_ids(db):
+    db.add_used_for_thread("abc", {"c1"})
+
+    assert db.add_used_for_thread("abc", {"c1", "c2"}) == 1
+    assert db.get_used_for_thread("abc") == {"c1", "c2"}
+
+
+def test_persists_across_connections(db):
+    db.add_used_for_thread("abc", {"c1"})
+    db._connection.close()
+    db._connection = None
+
+    assert db.get_used_for_thread("abc") == {"c1"}
+
+
+def test_migrates_legacy_json(db):
+    db.LEGACY_JSON_PATH.parent.mkdir(parents=True)
+    db.LEGACY_JSON_PATH.write_text(json.dumps({"abc": ["c1", "c2"], "xyz": ["c3"]}))
+
+    assert db.get_used_for_thread("abc") == {"c1", "c2"}
+    assert db.get_used_for_thread("xyz") == {"c3"}
+    assert not db.LEGACY_JSON_PATH.exists()
+    migrated_path = db.LEGACY_JSON_PATH.with_suffix(".json.migrated")
+    assert json.loads(migrated_path.read_text()) == {"abc": ["c1", "c2"], "xyz": ["c3"]}
+
+
+def test_reappearing_legacy_json_is_merged(db):
+    db.LEGACY_JSON_PATH.parent.mkdir(parents=True)
+    db.LEGACY_JSON_PATH.write_text(json.dumps({"abc": ["c1"]}))
+    db.get_used_for_thread("abc")
+    db._connection.close()
+    db._connection = None
+
+    # A legacy file showing up again is imported alongside what is already there, without duplicates
+    db.LEGACY_JSON_PATH.write_text(json.dumps({"abc": ["c1", "c2"]}))
+    assert db.get_used_for_thread("abc") == {"c1", "c2"}
+
+
+@pytest.mark.parametrize("content", ["not json", json.dumps(["c1", "c2"])])
+def test_unreadable_legacy_json_is_left_alone(db, content):
+    db.LEGACY_JSON_PATH.parent.mkdir(parents=True)
+    db.LEGACY_JSON_PATH.write_text(content)
+
+    assert db.get_used_for_thread("abc") == set()
+    assert db.LEGACY_JSON_PATH.read_text() == content
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from utils import videos
+from utils.json_io import append_json_line
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    """Points the module at a log and legacy file under tmp_path, with an empty cache."""
+    monkeypatch.setattr(videos, "VIDEOS_LOG_PATH", tmp_path / "videos.jsonl")
+    monkeypatch.setattr(videos, "LEGACY_VIDEOS_JSON_PATH", tmp_path / "videos.json")
+    monkeypatch.setattr(videos, "_done_videos_cache", {"stat": None, "data": []})
+    return videos
+
+
+def _video(video_id: str) -> dict:
+    return {
+        "subreddit": "AskReddit",
+        "id": video_id,
+        "time": "1700000000",
+        "background_credit": "someone",
+        "reddit_title": f"Title {video_id}",
+        "filename": f"{video_id}.mp4",
+    }
+
+
+def test_no_log_means_no_videos(log):
+    assert log.load_done_videos() == []
+
+
+def test_migrates_legacy_json(log):
+    legacy_videos = [_video("a"), _video("b")]
+    log.LEGACY_VIDEOS_JSON_PATH.write_text(json.dumps(legacy_videos))
+
+    assert log.load_done_videos() == legacy_videos
+    assert not log.LEGACY_VIDEOS_JSON_PATH.exists()
+    migrated_path = log.LEGACY_VIDEOS_JSON_PATH.with_suffix(".json.migrated")
+    assert json.loads(migrated_path.read_text()) == legacy_videos
+    assert not log.VIDEOS_LOG_PATH.with_name(log.VIDEOS_LOG_PATH.name + ".tmp").exists()
+
+
+def test_corrupted_legacy_json_starts_an_empty_log(log):
+    log.LEGACY_VIDEOS_JSON_PATH.write_text("[{")
+
+    assert log.load_done_videos() == []
+    assert log.VIDEOS_LOG_PATH.exists()
+    assert log.LEGACY_VIDEOS_JSON_PATH.with_suffix(".json.migrated").exists()
+
+
+def test_existing_log_skips_migration(log):
+    append_json_line(log.VIDEOS_LOG_PATH, _video("a"))
+    log.LEGACY_VIDEOS_JSON_PATH.write_text(json.dumps([_video("b")]))
+
+    assert log.load_done_videos() == [_video("a")]
+    assert log.LEGACY_VIDEOS_JSON_PATH.exists()
+
+
+def test_save_data_appends_and_updates_the_cache(log):
+    log.save_data("AskReddit", "a.mp4", "Title a", "a", "someone")
+    assert [video["id"] for video in log.load_done_videos()] == ["a"]
+
+    log.save_data("AskReddit", "b.mp4", "Title b", "b", "someone")
+    assert [video["id"] for video in log.load_done_videos()] == ["a", "b"]
+
+    # What the next run reads from disk matches the cached list
+    log._done_videos_cache.update(stat=None, data=[])
+    assert [video["id"] for video in log.load_done_videos()] == ["a", "b"]
+
+
+def test_save_data_skips_videos_already_logged(log):
+    log.save_data("AskReddit", "a.mp4", "Title a", "a", "someone")
+    log.save_data("AskReddit", "a.mp4", "Title a", "a", "someone")
+
+    assert [video["id"] for video in log.load_done_videos()] == ["a"]
+    assert len(log.VIDEOS_LOG_PATH.read_text().splitlines()) == 1
+
+
+def test_outside_append_invalidates_the_cache(log):
+    log.save_data("AskReddit", "a.mp4", "Title a", "a", "someone")
+    log.load_done_videos()
+
+    append_json_line(log.VIDEOS_LOG_PATH, _video("b"))
+
+    assert [video["id"] for video in log.load_done_videos()] == ["a", "b"]
+
+
+def test_corrupted_lines_are_skipped(log):
+    append_json_line(log.VIDEOS_LOG_PATH, _video("a"))
+    with open(log.VIDEOS_LOG_PATH, "a", encoding="utf-8") as f:
+        f.write('{"id": "b", "subre\n')
+    append_json_line(log.VIDEOS_LOG_PATH, _video("c"))
+
+    assert [video["id"] for video in log.load_done_videos()] == ["a", "c"]
@@ -1,6 +1,29 @@
 import os
-import shutil
-from os.path import exists
+from concurrent.futures import ThreadPoolExecutor
+
+# Below this many files the thread pool costs more than it saves, so the files are unlinked one by one
+PARALLEL_CLEANUP_MIN_FILES = 64
+CLEANUP_MAX_WORKERS = 16
+
+
+def _scan_tree(directory: str) -> tuple[list[str], list[str]]:
+    """Collects every file and directory under `directory` using os.scandir.
+
+    Returns:
+        tuple[list[str], list[str]]: The file paths, and the directory paths ordered parents first
+    """
+    files, directories = [], []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        directories.append(current)
+        with os.scandir(current) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                else:
+                    files.append(entry.path)
+    return files, directories
 
 
 def cleanup(reddit_id) -> int:
@@ -10,7 +33,18 @@ def cleanup(reddit_id) -> int:
         int: How many files were deleted
     """
     directory = f"../assets/temp/{reddit_id}/"
-    if exists(directory):
-        shutil.rmtree(directory)
+    try:
+        files, directories = _scan_tree(directory)
+    except FileNotFoundError:
+        return 0
 
-        return 1
+    if len(files) < PARALLEL_CLEANUP_MIN_FILES:
+        for path in files:
+            os.unlink(path)
+    else:
+        # Unlinking is syscall-bound, so threads hide the per-file latency
+        with ThreadPoolExecutor(max_workers=CLEANUP_MAX_WORKERS) as executor:
+            list(executor.map(os.unlink, files))
+    for path in reversed(directories):  # children before their parents
+        os.rmdir(path)
+    return len(files)
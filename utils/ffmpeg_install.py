@@ -1,9 +1,63 @@
+import functools
 import os
+import shutil
 import subprocess
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_CONNECTIONS = 8
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+def _download_range(url: str, filename: str, start: int, end: int) -> None:
+    with requests.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise RangeNotSupported(f"Server answered {r.status_code} to a range request")
+        with open(filename, "r+b") as f:
+            f.seek(start)
+            shutil.copyfileobj(r.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+
+
+def _download_file(url: str, filename: str) -> None:
+    """Downloads `url` over several parallel range requests, or one streamed request if the server can't do ranges."""
+    head = requests.head(url, allow_redirects=True, timeout=30)
+    total_size = int(head.headers.get("Content-Length", 0))
+    if head.ok and head.headers.get("Accept-Ranges") == "bytes" and total_size > 0:
+        # Pre-size the file so every worker can write its slice in place
+        with open(filename, "wb") as f:
+            f.truncate(total_size)
+        part_size = -(-total_size // DOWNLOAD_CONNECTIONS)
+        ranges = [
+            (start, min(start + part_size, total_size) - 1)
+            for start in range(0, total_size, part_size)
+        ]
+        try:
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_CONNECTIONS) as executor:
+                # head.url is the final URL after redirects, so the range requests skip them
+                list(executor.map(lambda r: _download_range(head.url, filename, *r), ranges))
+            return
+        except RangeNotSupported:
+            pass
+
+    # Stream the file straight to disk instead of holding the whole download in memory
+    with requests.get(url, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        with open(filename, "wb") as f:
+            shutil.copyfileobj(r.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+
+
+def _extract_member(zip_ref: zipfile.ZipFile, member: zipfile.ZipInfo, target: str) -> None:
+    """Streams one archive member to `target` without holding it in memory."""
+    with zip_ref.open(member) as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, length=DOWNLOAD_CHUNK_SIZE)
+
 
 def ffmpeg_install_windows():
     try:
@@ -11,43 +65,19 @@ def ffmpeg_install_windows():
             "https://github.com/GyanD/codexffmpeg/releases/download/6.0/ffmpeg-6.0-full_build.zip"
         )
         ffmpeg_zip_filename = "ffmpeg.zip"
-        ffmpeg_extracted_folder = "ffmpeg"
 
         if os.path.exists(ffmpeg_zip_filename):
             os.remove(ffmpeg_zip_filename)
 
-        r = requests.get(ffmpeg_url)
-        with open(ffmpeg_zip_filename, "wb") as f:
-            f.write(r.content)
-
-        if os.path.exists(ffmpeg_extracted_folder):
-            for root, dirs, files in os.walk(ffmpeg_extracted_folder, topdown=False):
-                for file in files:
-                    os.remove(os.path.join(root, file))
-                for dir in dirs:
-                    os.rmdir(os.path.join(root, dir))
-            os.rmdir(ffmpeg_extracted_folder)
+        _download_file(ffmpeg_url, ffmpeg_zip_filename)
 
+        # Only the executables in bin/ are needed, so nothing else in the archive is ever written to disk
         with zipfile.ZipFile(ffmpeg_zip_filename, "r") as zip_ref:
-            zip_ref.extractall()
-        os.remove("ffmpeg.zip")
-
-        os.rename(f"{ffmpeg_extracted_folder}-6.0-full_build", ffmpeg_extracted_folder)
-        for file in os.listdir(os.path.join(ffmpeg_extracted_folder, "bin")):
-            os.rename(
-                os.path.join(ffmpeg_extracted_folder, "bin", file),
-                os.path.join(".", file),
-            )
-        os.rmdir(os.path.join(ffmpeg_extracted_folder, "bin"))
-        for file in os.listdir(os.path.join(ffmpeg_extracted_folder, "doc")):
-            os.remove(os.path.join(ffmpeg_extracted_folder, "doc", file))
-        for file in os.listdir(os.path.join(ffmpeg_extracted_folder, "presets")):
-            os.remove(os.path.join(ffmpeg_extracted_folder, "presets", file))
-        os.rmdir(os.path.join(ffmpeg_extracted_folder, "presets"))
-        os.rmdir(os.path.join(ffmpeg_extracted_folder, "doc"))
-        os.remove(os.path.join(ffmpeg_extracted_folder, "LICENSE"))
-        os.remove(os.path.join(ffmpeg_extracted_folder, "README.txt"))
-        os.rmdir(ffmpeg_extracted_folder)
+            for member in zip_ref.infolist():
+                if "/bin/" not in member.filename or member.is_dir():
+                    continue
+                _extract_member(zip_ref, member, os.path.basename(member.filename))
+        os.remove(ffmpeg_zip_filename)
 
         print(
             "FFmpeg installed successfully! Please restart your computer and then re-run the program."
@@ -95,40 +125,36 @@ def ffmpeg_install_mac():
     exit()
 
 
+@functools.cache
+def _ffmpeg_ok() -> bool:
+    """Checks for ffmpeg on PATH once per process. shutil.which only stats PATH entries, nothing is spawned."""
+    return shutil.which("ffmpeg") is not None
+
+
 def ffmpeg_install():
-    try:
-        subprocess.run(
-            ["ffmpeg", "-version"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-    except FileNotFoundError as e:
-        if os.path.exists("./ffmpeg.exe"):
-            print(
-                "FFmpeg is installed on this system! If you are seeing this error for the second time, restart your computer."
-            )
-        print("FFmpeg is not installed on this system.")
-        resp = input(
-            "We can try to automatically install it for you. Would you like to do that? (y/n): "
+    if _ffmpeg_ok():
+        return None
+
+    if os.path.exists("./ffmpeg.exe"):
+        print(
+            "FFmpeg is installed on this system! If you are seeing this error for the second time, restart your computer."
         )
-        if resp.lower() == "y":
-            print("Installing FFmpeg...")
-            if os.name == "nt":
-                ffmpeg_install_windows()
-            elif os.name == "posix":
-                ffmpeg_install_linux()
-            elif os.name == "mac":
-                ffmpeg_install_mac()
-            else:
-                print("Your OS is not supported. Please install FFmpeg manually and try again.")
-                exit()
+    print("FFmpeg is not installed on this system.")
+    resp = input(
+        "We can try to automatically install it for you. Would you like to do that? (y/n): "
+    )
+    if resp.lower() == "y":
+        print("Installing FFmpeg...")
+        if os.name == "nt":
+            ffmpeg_install_windows()
+        elif os.name == "posix":
+            ffmpeg_install_linux()
+        elif os.name == "mac":
+            ffmpeg_install_mac()
         else:
-            print("Please install FFmpeg manually and try again.")
+            print("Your OS is not supported. Please install FFmpeg manually and try again.")
             exit()
-    except Exception as e:
-        print(
-            "Welcome fellow traveler! You're one of the few who have made it this far. We have no idea how you got at this error, but we're glad you're here. Please report this error to the developer, and we'll try to fix it as soon as possible. Thank you for your patience!"
-        )
-        print(e)
+    else:
+        print("Please install FFmpeg manually and try again.")
+        exit()
     return None
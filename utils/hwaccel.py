@@ -0,0 +1,111 @@
+import functools
+import subprocess
+
+# Tried in order, the first one that can actually encode a frame on this machine wins
+HARDWARE_H264_ENCODERS = ["h264_nvenc", "h264_qsv"]
+SOFTWARE_H264_ENCODER = "libx264"
+
+# Output options per encoder, tuned for the 20 Mbit/s renders made in video_creation/final_video.py
+ENCODER_ARGS = {
+    "h264_nvenc": {
+        "c:v": "h264_nvenc",
+        "preset": "p4",
+        "tune": "hq",
+        "rc": "vbr",
+        "b:v": "20M",
+        "bf": 2,
+        "rc-lookahead": 20,
+    },
+    "h264_qsv": {
+        "c:v": "h264_qsv",
+        "preset": "medium",
+        "b:v": "20M",
+    },
+    "libx264": {
+        "c:v": "libx264",
+        "b:v": "20M",
+    },
+}
+
+
+# Filters the GPU composite in video_creation/final_video.py needs besides NVENC
+CUDA_COMPOSITE_FILTERS = ["hwupload_cuda", "overlay_cuda", "scale_cuda"]
+
+
+def _ffmpeg_list(option: str) -> str:
+    """Returns the output of `ffmpeg -encoders`, `ffmpeg -filters` and the like, empty if ffmpeg can't run."""
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", option],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except OSError:
+        return ""
+    return result.stdout
+
+
+def _can_encode(encoder: str) -> bool:
+    """Encodes one tiny frame with `encoder`. Being listed by `ffmpeg -encoders` only means it was
+    compiled in, not that a matching GPU and driver are present."""
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "color=size=256x256:duration=0.1",
+                "-frames:v",
+                "1",
+                "-c:v",
+                encoder,
+                "-f",
+                "null",
+                "-",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+
+@functools.cache
+def pick_h264_encoder() -> str:
+    """Returns the fastest H.264 encoder that works on this machine, checked once per process."""
+    available = _ffmpeg_list("-encoders")
+    for encoder in HARDWARE_H264_ENCODERS:
+        if f" {encoder} " in available and _can_encode(encoder):
+            return encoder
+    return SOFTWARE_H264_ENCODER
+
+
+def h264_encoder_args() -> dict:
+    """Returns the ffmpeg output options for the encoder picked by pick_h264_encoder()."""
+    return dict(ENCODER_ARGS[pick_h264_encoder()])
+
+
+def hwaccel_input_args() -> dict:
+    """Returns ffmpeg input options that move decoding onto the GPU when NVENC (and so CUDA) is in use.
+
+    Decoded frames are copied back to system memory, so the CPU filters that follow keep working.
+    """
+    if pick_h264_encoder() == "h264_nvenc":
+        return {"hwaccel": "cuda"}
+    return {}
+
+
+@functools.cache
+def cuda_composite_available() -> bool:
+    """Whether the overlays can be composited on the GPU: NVENC works and ffmpeg has the CUDA filters."""
+    if pick_h264_encoder() != "h264_nvenc":
+        return False
+    available = _ffmpeg_list("-filters")
+    return all(f" {name} " in available for name in CUDA_COMPOSITE_FILTERS)
@@ -2,10 +2,12 @@ import re
 
 from utils.console import print_substep
 
+_ID_RE = re.compile(r"[^\w\s-]")
+
 
 def id(reddit_obj: dict):
     """
     This function takes a reddit object and returns the post id
     """
-    id = re.sub(r"[^\w\s-]", "", reddit_obj["thread_id"])
+    id = _ID_RE.sub("", reddit_obj["thread_id"])
     return id
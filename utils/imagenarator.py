@@ -76,3 +76,45 @@ def imagemaker(theme, reddit_obj: dict, txtclr, padding=5, transparent=False) ->
         text = process_text(text, False)
         draw_multiple_line_text(image, text, font, txtclr, padding, wrap=30, transparent=transparent)
         image.save(f"assets/temp/{id}/png/img{idx}.png")
+
+
+def _wrap_to_width(text: str, font: ImageFont.FreeTypeFont, max_width: float) -> list[str]:
+    """Wraps each paragraph of `text` on the rendered width of the candidate line, breaking words that are
+    wider than a whole line by character."""
+    lines = []
+    for paragraph in text.splitlines():
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if font.getlength(candidate) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            line = ""
+            for char in word:
+                if line and font.getlength(line + char) > max_width:
+                    lines.append(line)
+                    line = ""
+                line += char
+        if line:
+            lines.append(line)
+    return lines
+
+
+def comment_card(text: str, theme, txtclr, width: int, padding: int = 24) -> Image.Image:
+    """Draws a comment as plain left-aligned text on a `width` wide card, as tall as the text needs.
+
+    Stands in for a browser screenshot of comments that are only text.
+    """
+    font = ImageFont.truetype(os.path.join("fonts", "Roboto-Regular.ttf"), max(16, width // 30))
+    lines = _wrap_to_width(text, font, width - 2 * padding)
+    line_height = getheight(font, "Ay") + padding // 2
+
+    image = Image.new("RGBA", (width, max(1, len(lines)) * line_height + 2 * padding), theme)
+    draw = ImageDraw.Draw(image)
+    y = padding
+    for line in lines:
+        draw.text((padding, y), line, font=font, fill=txtclr)
+        y += line_height
+    return image
@@ -0,0 +1,69 @@
+import json
+import os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib json module is used instead
+    orjson = None
+
+# orjson.JSONDecodeError subclasses this, so callers can keep catching the stdlib exception
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: bytes | str):
+    """Parses one JSON document, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path: Path | str):
+    """Reads and parses a JSON file, with orjson when it is installed."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_json(path: Path | str, data, *, indent: bool = True) -> None:
+    """Writes `data` to `path` as JSON, with orjson when it is installed.
+
+    The file is written to a temporary sibling first and swapped in with os.replace,
+    so a crash mid-write never leaves a truncated file behind.
+
+    Args:
+        indent (bool): Pretty-print with two-space indentation, otherwise write compact JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE | (orjson.OPT_INDENT_2 if indent else 0)
+        serialized = orjson.dumps(data, option=option)
+    else:
+        serialized = (
+            json.dumps(data, ensure_ascii=False, indent=2 if indent else None) + "\n"
+        ).encode("utf-8")
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(serialized)
+    os.replace(tmp_path, path)
+
+
+def append_json_line(path: Path | str, data) -> None:
+    """Appends `data` as one compact line to a JSON Lines file, so a save costs O(1) regardless of file size."""
+    if orjson is not None:
+        serialized = orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+    else:
+        serialized = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(path, "ab") as f:
+        f.write(serialized)
+
+
+def write_json_lines(path: Path | str, records) -> None:
+    """Writes `records` to `path` as a JSON Lines file, swapped in with os.replace like write_json."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for record in records:
+            if orjson is not None:
+                f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+            else:
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+    os.replace(tmp_path, path)
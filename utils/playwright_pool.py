@@ -0,0 +1,77 @@
+import asyncio
+import atexit
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+
+from utils.console import print_substep
+
+# Fewer helper processes and no GPU/background work: the browser only loads pages to screenshot them.
+# (Playwright already launches Chromium without its sandbox by default.)
+CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-extensions",
+    "--no-default-browser-check",
+    "--no-first-run",
+    "--disable-features=Translate,site-per-process,IsolateOrigins",
+    "--mute-audio",
+    "--disable-sync",
+]
+
+# The browser outlives a single asyncio.run(), so everything runs on one loop kept for the whole process
+_loop: asyncio.AbstractEventLoop | None = None
+_playwright: Playwright | None = None
+_browser: Browser | None = None
+
+
+def run(coro):
+    """Runs `coro` on the pool's event loop and returns its result."""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+
+async def _get_browser() -> Browser:
+    """Launches Chromium on first use, or again if it went away."""
+    global _playwright, _browser
+    if _browser is None or not _browser.is_connected():
+        print_substep("Launching Headless Browser...")
+        if _playwright is None:
+            _playwright = await async_playwright().start()
+        _browser = await _playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+    return _browser
+
+
+@asynccontextmanager
+async def acquire(**context_options) -> AsyncIterator[BrowserContext]:
+    """Yields a fresh context from the shared browser and closes it afterwards.
+
+    Contexts are cheap and keep cookies and routes apart between calls; the browser is not.
+    """
+    browser = await _get_browser()
+    context = await browser.new_context(**context_options)
+    try:
+        yield context
+    finally:
+        await context.close()
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _loop is None:
+        return
+
+    async def close() -> None:
+        if _browser is not None and _browser.is_connected():
+            await _browser.close()
+        if _playwright is not None:
+            await _playwright.stop()
+
+    _loop.run_until_complete(close())
+    _loop.close()
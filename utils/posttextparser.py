@@ -1,32 +1,48 @@
-import os
-import re
-import time
 from typing import List, Dict, Any
 
+import numpy as np
 import spacy
 
-from utils.console import print_step
 from utils.voice import sanitize_text
 from utils import settings
 
 TIKTOK_TTS_CHAR_LIMIT = 250
 
+_NLP = None
+
+
+def _get_nlp():
+    """Builds the spaCy pipeline once per process. Only `doc.sents` is used, so a blank English
+    tokenizer with the rule-based sentencizer is enough and no model has to be downloaded."""
+    global _NLP
+    if _NLP is None:
+        _NLP = spacy.blank("en")
+        _NLP.add_pipe("sentencizer")
+    return _NLP
+
+
+def _split_words_by_char_limit(words: List[str], char_limit: int) -> List[str]:
+    """Greedily packs words into space-joined chunks of at most `char_limit` characters.
+
+    A word longer than the limit gets a chunk of its own. Split points are found with
+    np.cumsum + np.searchsorted instead of a per-word Python loop.
+    """
+    # cumulative_lengths[i] is the length of words[:i + 1] joined by spaces, plus one trailing space
+    cumulative_lengths = np.cumsum(np.fromiter((len(word) + 1 for word in words), dtype=np.int64, count=len(words)))
+    chunks = []
+    start = 0
+    while start < len(words):
+        chunk_offset = cumulative_lengths[start - 1] if start else 0
+        end = int(np.searchsorted(cumulative_lengths, chunk_offset + char_limit + 1, side="right"))
+        end = max(end, start + 1)
+        chunks.append(" ".join(words[start:end]))
+        start = end
+    return chunks
+
 # working good
-def posttextparser(obj, *, tried: bool = False) -> List[Dict[str, Any]]:
-    raw_text: str = re.sub("\n", " ", obj)
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except OSError as e:
-        if not tried:
-            os.system("python -m spacy download en_core_web_sm")
-            time.sleep(5)
-            return posttextparser(obj, tried=True)
-        print_step(
-            "The spacy model can't load. You need to install it with the command \npython -m spacy download en_core_web_sm "
-        )
-        raise e
-
-    doc = nlp(raw_text)
+def posttextparser(obj) -> List[Dict[str, Any]]:
+    raw_text: str = obj.replace("\n", " ")
+    doc = _get_nlp()(raw_text)
     
     parsed_content: List[Dict[str, Any]] = []
     max_words_per_visual_chunk = settings.config["settings"].get("max_words_per_segment", 0)
@@ -40,21 +56,9 @@ def posttextparser(obj, *, tried: bool = False) -> List[Dict[str, Any]]:
 
         sentence_audio_chunks_to_process: List[str] = []
         if len(sanitized_full_sentence_text) > TIKTOK_TTS_CHAR_LIMIT:
-            words_of_sentence = sanitized_full_sentence_text.split()
-            current_chunk_words = []
-            current_chunk_len = 0
-            for word in words_of_sentence:
-                if current_chunk_len + len(word) + (1 if current_chunk_words else 0) > TIKTOK_TTS_CHAR_LIMIT:
-                    if current_chunk_words:
-                        sentence_audio_chunks_to_process.append(" ".join(current_chunk_words))
-                    current_chunk_words = [word]
-                    current_chunk_len = len(word)
-                else:
-                    current_chunk_words.append(word)
-                    current_chunk_len += len(word) + (1 if len(current_chunk_words) > 1 else 0)
-            
-            if current_chunk_words:
-                sentence_audio_chunks_to_process.append(" ".join(current_chunk_words))
+            sentence_audio_chunks_to_process = _split_words_by_char_limit(
+                sanitized_full_sentence_text.split(), TIKTOK_TTS_CHAR_LIMIT
+            )
             
             if not sentence_audio_chunks_to_process and sanitized_full_sentence_text:
                  sentence_audio_chunks_to_process.append(sanitized_full_sentence_text[:TIKTOK_TTS_CHAR_LIMIT])
@@ -73,14 +77,10 @@ def posttextparser(obj, *, tried: bool = False) -> List[Dict[str, Any]]:
                 if not words_in_audio_chunk:
                     continue
                 
-                current_visual_chunk_words = []
-                for word in words_in_audio_chunk:
-                    current_visual_chunk_words.append(word)
-                    if len(current_visual_chunk_words) >= max_words_per_visual_chunk:
-                        current_sentence_visual_chunks.append(" ".join(current_visual_chunk_words))
-                        current_visual_chunk_words = []
-                if current_visual_chunk_words:
-                    current_sentence_visual_chunks.append(" ".join(current_visual_chunk_words))
+                current_sentence_visual_chunks = [
+                    " ".join(words_in_audio_chunk[i : i + max_words_per_visual_chunk])
+                    for i in range(0, len(words_in_audio_chunk), max_words_per_visual_chunk)
+                ]
             else:
                 current_sentence_visual_chunks.append(audio_chunk_text)
 
@@ -0,0 +1,84 @@
+import sqlite3
+from pathlib import Path
+
+from utils.console import print_substep
+from utils.json_io import JSONDecodeError, read_json
+
+DB_PATH = Path("video_creation/data/used_content.db")
+LEGACY_JSON_PATH = Path("video_creation/data/used_comments.json")
+
+_connection = None
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Opens the database on first use, creating the table and importing the legacy JSON file if needed."""
+    global _connection
+    if _connection is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _connection = sqlite3.connect(DB_PATH)
+        with _connection:
+            _connection.execute(
+                "CREATE TABLE IF NOT EXISTS used ("
+                "thread_id TEXT NOT NULL, comment_id TEXT NOT NULL, PRIMARY KEY (thread_id, comment_id)"
+                ") WITHOUT ROWID"
+            )
+        _migrate_legacy_json(_connection)
+    return _connection
+
+
+def _migrate_legacy_json(connection: sqlite3.Connection) -> None:
+    """One-shot import of `used_comments.json` (thread_id -> list of comment_ids) into the database."""
+    if not LEGACY_JSON_PATH.exists():
+        return
+    try:
+        legacy_data = read_json(LEGACY_JSON_PATH)
+    except (JSONDecodeError, OSError) as e:
+        print_substep(
+            f"Warning: Could not read `{LEGACY_JSON_PATH}` for migration: {e}. Skipping it.",
+            style="bold yellow",
+        )
+        return
+    if not isinstance(legacy_data, dict):
+        print_substep(
+            f"Warning: `{LEGACY_JSON_PATH}` was not a dictionary. Skipping migration.",
+            style="bold yellow",
+        )
+        return
+
+    with connection:
+        connection.executemany(
+            "INSERT OR IGNORE INTO used (thread_id, comment_id) VALUES (?, ?)",
+            (
+                (thread_id, comment_id)
+                for thread_id, comment_ids in legacy_data.items()
+                for comment_id in comment_ids
+            ),
+        )
+    migrated_path = LEGACY_JSON_PATH.with_suffix(".json.migrated")
+    LEGACY_JSON_PATH.replace(migrated_path)
+    print_substep(
+        f"Migrated used comment IDs from `{LEGACY_JSON_PATH}` to `{DB_PATH}` (old file kept as `{migrated_path}`).",
+        style="bold blue",
+    )
+
+
+def get_used_for_thread(thread_id: str) -> set[str]:
+    """Returns the IDs of the comments already used for a thread."""
+    rows = _get_connection().execute("SELECT comment_id FROM used WHERE thread_id = ?", (thread_id,))
+    return {comment_id for (comment_id,) in rows}
+
+
+def add_used_for_thread(thread_id: str, comment_ids: set[str]) -> int:
+    """Records comment IDs as used for a thread.
+
+    Returns:
+        int: How many of the IDs were not recorded before
+    """
+    connection = _get_connection()
+    changes_before = connection.total_changes
+    with connection:
+        connection.executemany(
+            "INSERT OR IGNORE INTO used (thread_id, comment_id) VALUES (?, ?)",
+            ((thread_id, comment_id) for comment_id in comment_ids),
+        )
+    return connection.total_changes - changes_before
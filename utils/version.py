@@ -1,27 +1,67 @@
+from pathlib import Path
+
 import requests
+from packaging.version import InvalidVersion, Version
 from requests.exceptions import JSONDecodeError
 
 from utils.console import print_step
+from utils.json_io import read_json, write_json
 
+LATEST_RELEASE_URL = "https://api.github.com/repos/elebumm/RedditVideoMakerBot/releases/latest"
+# Holds the ETag and tag_name of the last response so repeat runs can get a 304 back
+VERSION_CACHE_PATH = Path("video_creation/data/.version_cache.json")
 
-def checkversion(__VERSION__: str):
+_SESSION = requests.Session()
+
+
+def _load_version_cache() -> dict:
     try:
-        response = requests.get(
-            "https://api.github.com/repos/elebumm/RedditVideoMakerBot/releases/latest",
-            timeout=5
-        )
-        response.raise_for_status()
+        cache = read_json(VERSION_CACHE_PATH)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _fetch_latest_version() -> str | None:
+    """Returns the latest release tag, sending the cached ETag so an unchanged release skips the JSON body."""
+    cache = _load_version_cache()
+    headers = {"If-None-Match": cache["etag"]} if cache.get("etag") and cache.get("tag_name") else {}
+
+    response = _SESSION.get(LATEST_RELEASE_URL, headers=headers, timeout=5)
+    if response.status_code == 304:
+        return cache["tag_name"]
+    response.raise_for_status()
+
+    latestversion = response.json().get("tag_name")
+    if latestversion and response.headers.get("ETag"):
+        try:
+            write_json(VERSION_CACHE_PATH, {"etag": response.headers["ETag"], "tag_name": latestversion})
+        except OSError:
+            pass  # The cache only saves a request body, it is fine to go without it
+    return latestversion
 
-        latestversion_data = response.json()
-        latestversion = latestversion_data.get("tag_name")
+
+def _parse_version(version: str) -> Version:
+    return Version(version.removeprefix("v"))
+
+
+def checkversion(__VERSION__: str):
+    try:
+        latestversion = _fetch_latest_version()
 
         if not latestversion:
             print_step("Could not find 'tag_name' in version check response. Skipping version check.")
             return
 
-        if __VERSION__ == latestversion:
+        try:
+            current, latest = _parse_version(__VERSION__), _parse_version(latestversion)
+        except InvalidVersion:
+            print_step(f"Could not compare version '{__VERSION__}' with '{latestversion}'. Skipping version check.")
+            return
+
+        if current == latest:
             print_step(f"You are using the newest version ({__VERSION__}) of the bot")
-        elif __VERSION__ < latestversion:
+        elif current < latest:
             print_step(
                 f"You are using an older version ({__VERSION__}) of the bot. Download the newest version ({latestversion}) from https://github.com/elebumm/RedditVideoMakerBot/releases/latest"
             )
@@ -1,4 +1,3 @@
-import json
 import time
 from pathlib import Path
 
@@ -6,6 +5,76 @@ from praw.models import Submission
 
 from utils import settings
 from utils.console import print_step, print_substep
+from utils.json_io import (
+    JSONDecodeError,
+    append_json_line,
+    loads,
+    read_json,
+    write_json_lines,
+)
+
+VIDEOS_LOG_PATH = Path("./video_creation/data/videos.jsonl")
+LEGACY_VIDEOS_JSON_PATH = Path("./video_creation/data/videos.json")
+
+# Parsed records of videos.jsonl, reused while the file's (mtime, size) is unchanged
+_done_videos_cache = {"stat": None, "data": []}
+
+
+def _migrate_legacy_videos_json() -> None:
+    """One-shot conversion of the old `videos.json` list into the `videos.jsonl` log."""
+    if VIDEOS_LOG_PATH.exists() or not LEGACY_VIDEOS_JSON_PATH.exists():
+        return
+    try:
+        legacy_videos = read_json(LEGACY_VIDEOS_JSON_PATH)
+    except JSONDecodeError:
+        print_substep("`videos.json` was corrupted. Starting a new `videos.jsonl`.", style="bold yellow")
+        legacy_videos = []
+    if not isinstance(legacy_videos, list):
+        print_substep("`videos.json` was not a list. Starting a new `videos.jsonl`.", style="bold yellow")
+        legacy_videos = []
+
+    # Written whole and swapped in, so an interrupted migration leaves no partial log behind and reruns
+    write_json_lines(VIDEOS_LOG_PATH, legacy_videos)
+    migrated_path = LEGACY_VIDEOS_JSON_PATH.with_suffix(".json.migrated")
+    LEGACY_VIDEOS_JSON_PATH.replace(migrated_path)
+    print_substep(f"Migrated `{LEGACY_VIDEOS_JSON_PATH}` to `{VIDEOS_LOG_PATH}` (old file kept as `{migrated_path}`).", style="bold blue")
+
+
+def _log_stat() -> tuple[int, int] | None:
+    try:
+        stat = VIDEOS_LOG_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_done_videos() -> list:
+    """Reads every record from `videos.jsonl`. Lines that can't be parsed (e.g. cut off by a crash) are skipped.
+
+    The parsed list is cached and only re-read when the file's mtime or size changes, so
+    check_done and save_data don't parse the log twice per video. Callers must not mutate it.
+
+    Returns:
+        list: The done video records, oldest first
+    """
+    _migrate_legacy_videos_json()
+    stat = _log_stat()
+    if stat is None:
+        return []
+    if stat == _done_videos_cache["stat"]:
+        return _done_videos_cache["data"]
+
+    done_videos = []
+    with open(VIDEOS_LOG_PATH, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                done_videos.append(loads(line))
+            except JSONDecodeError:
+                print_substep(f"Skipping a corrupted line in `{VIDEOS_LOG_PATH}`.", style="bold yellow")
+    _done_videos_cache.update(stat=stat, data=done_videos)
+    return done_videos
 
 
 def check_done(
@@ -20,42 +89,21 @@ def check_done(
     Returns:
         Submission|None: Reddit object in args
     """
-    videos_json_path = Path("./video_creation/data/videos.json")
-    done_videos = []
-
-    if videos_json_path.exists():
-        try:
-            with open(videos_json_path, "r", encoding="utf-8") as done_vids_raw:
-                loaded_data = json.load(done_vids_raw)
-                if isinstance(loaded_data, list):
-                    done_videos = loaded_data
-                else:
-                    with open(videos_json_path, "w", encoding="utf-8") as f_write:
-                        json.dump([], f_write)
-                    print_substep("`videos.json` was not a list. Initialized as empty list.", style="bold yellow")
-        except json.JSONDecodeError:
-            with open(videos_json_path, "w", encoding="utf-8") as f_write:
-                json.dump([], f_write)
-            print_substep("`videos.json` was corrupted. Initialized as empty list.", style="bold yellow")
-    else:
-        with open(videos_json_path, "w", encoding="utf-8") as f_write:
-            json.dump([], f_write)
-        print_substep("`videos.json` not found. Created with empty list.", style="bold yellow")
-
-    for video in done_videos:
-        if video["id"] == str(redditobj):
-            if settings.config["reddit"]["thread"]["post_id"]:
-                print_step(
-                    "You already have done this video but since it was declared specifically in the config file the program will continue"
-                )
-                return redditobj
-            print_step("Getting new post as the current one has already been done")
-            return None
+    done_videos = load_done_videos()
+    reddit_id = str(redditobj)
+    if any(video["id"] == reddit_id for video in done_videos):
+        if settings.config["reddit"]["thread"]["post_id"]:
+            print_step(
+                "You already have done this video but since it was declared specifically in the config file the program will continue"
+            )
+            return redditobj
+        print_step("Getting new post as the current one has already been done")
+        return None
     return redditobj
 
 
 def save_data(subreddit: str, filename: str, reddit_title: str, reddit_id: str, credit: str):
-    """Saves the videos that have already been generated to a JSON file in video_creation/data/videos.json
+    """Appends the video that was just generated to the JSON Lines log in video_creation/data/videos.jsonl
 
     Args:
         filename (str): The finished video title name
@@ -64,23 +112,7 @@ def save_data(subreddit: str, filename: str, reddit_title: str, reddit_id: str,
         @param reddit_id:
         @param reddit_title:
     """
-    videos_json_path = Path("./video_creation/data/videos.json")
-    done_vids = []
-
-    if videos_json_path.exists():
-        try:
-            with open(videos_json_path, "r", encoding="utf-8") as raw_vids_read:
-                loaded_data = json.load(raw_vids_read)
-                if isinstance(loaded_data, list):
-                    done_vids = loaded_data
-        except json.JSONDecodeError:
-            pass
-
-    if not isinstance(done_vids, list):
-        done_vids = []
-        print_substep("Warning: `videos.json` was invalid or empty, initialized as new list for saving.", style="bold yellow")
-
-    if reddit_id in [video["id"] for video in done_vids]:
+    if any(video["id"] == reddit_id for video in load_done_videos()):
         return  # video already done but was specified to continue anyway in the config file
     payload = {
         "subreddit": subreddit,
@@ -90,7 +122,9 @@ def save_data(subreddit: str, filename: str, reddit_title: str, reddit_id: str,
         "reddit_title": reddit_title,
         "filename": filename,
     }
-    done_vids.append(payload)
-    
-    with open(videos_json_path, "w", encoding="utf-8") as raw_vids_write:
-        json.dump(done_vids, raw_vids_write, ensure_ascii=False, indent=4)
+    cache_is_current = _log_stat() == _done_videos_cache["stat"]
+    append_json_line(VIDEOS_LOG_PATH, payload)
+    if cache_is_current:
+        # Keep the cache in step with our own append instead of re-parsing the whole log next time
+        _done_videos_cache["data"].append(payload)
+        _done_videos_cache["stat"] = _log_stat()
@@ -1,170 +1,441 @@
+import functools
 import multiprocessing
 import os
 import re
-import tempfile
 import textwrap
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
 from os.path import exists  # Needs to be imported specifically
 from pathlib import Path
 from typing import Dict, Final, Tuple
 
 import ffmpeg
+import numpy as np
 import translators
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageFont
 from rich.console import Console
 from rich.progress import track
+from tqdm import tqdm
 
 from utils import settings
 from utils.cleanup import cleanup
 from utils.console import print_step, print_substep
 from utils.fonts import getheight
+from utils.hwaccel import (
+    SOFTWARE_H264_ENCODER,
+    cuda_composite_available,
+    h264_encoder_args,
+    hwaccel_input_args,
+)
+from utils.json_io import JSONDecodeError, read_json, write_json
 from utils.thumbnail import create_thumbnail
 from utils.videos import save_data
 
 console = Console()
 
+PROBE_MAX_WORKERS = 8
+# Frame threads for a single libx264 encode, more than this makes it slower rather than faster
+X264_MAX_THREADS = 8
+# libx264 stops scaling well past a handful of threads, so long renders are cut into segments that
+# are encoded side by side with this many threads each and stitched back together
+SEGMENT_THREADS_PER_JOB = 4
+SEGMENT_MAX_JOBS = 8
+SEGMENT_MIN_SECONDS = 10
+TRANSLATE_CACHE_PATH = Path("assets/temp/translate_cache.json")
+# Title layout by the number of lines the title wraps to at the default width:
+# (font size, extra wrap width, vertical offset), the last entry covers 5 lines and more
+FANCY_TITLE_LAYOUTS = (
+    (47, 0, 30),
+    (47, 0, 30),
+    (47, 0, 30),
+    (40, 10, 35),
+    (35, 10, 40),
+    (30, 10, 30),
+)
+
 
 class ProgressFfmpeg(threading.Thread):
-    def __init__(self, vid_duration_seconds, progress_update_callback):
-        threading.Thread.__init__(self, name="ProgressFfmpeg")
-        self.stop_event = threading.Event()
-        self.output_file = tempfile.NamedTemporaryFile(mode="w+", delete=False)
+    """Reports the progress ffmpeg writes to its stdout when run with `-progress pipe:1`."""
+
+    def __init__(self, process, vid_duration_seconds, progress_update_callback):
+        threading.Thread.__init__(self, name="ProgressFfmpeg", daemon=True)
+        self.process = process
         self.vid_duration_seconds = vid_duration_seconds
         self.progress_update_callback = progress_update_callback
 
     def run(self):
-        while not self.stop_event.is_set():
-            latest_progress = self.get_latest_ms_progress()
-            if latest_progress is not None:
-                completed_percent = latest_progress / self.vid_duration_seconds
-                self.progress_update_callback(completed_percent)
-            time.sleep(1)
-
-    def get_latest_ms_progress(self):
-        lines = self.output_file.readlines()
-
-        if lines:
-            for line in lines:
-                if "out_time_ms" in line:
-                    out_time_ms_str = line.split("=")[1].strip()
-                    if out_time_ms_str.isnumeric():
-                        return float(out_time_ms_str) / 1000000.0
-                    else:
-                        # Handle the case when "N/A" is encountered
-                        return None
-        return None
-
-    def stop(self):
-        self.stop_event.set()
-
-    def __enter__(self):
-        self.start()
-        return self
-
-    def __exit__(self, *args, **kwargs):
-        self.stop()
+        # Lines arrive as ffmpeg writes them and the loop ends when ffmpeg closes its stdout
+        for line in self.process.stdout:
+            if line.startswith(b"out_time_ms="):
+                out_time_ms_str = line[len(b"out_time_ms="):].strip()
+                # "N/A" is written until the first frame is out
+                if out_time_ms_str.isdigit():
+                    completed_percent = int(out_time_ms_str) / 1000000.0 / self.vid_duration_seconds
+                    self.progress_update_callback(completed_percent)
+
+
+# Applied in order by name_normalize
+_NAME_NORMALIZE_SUBS = (
+    (re.compile(r'[?\\"%*:|<>]'), ""),
+    (re.compile(r"( [w,W]\s?\/\s?[o,O,0])"), r" without"),
+    (re.compile(r"( [w,W]\s?\/)"), r" with"),
+    (re.compile(r"(\d+)\s?\/\s?(\d+)"), r"\1 of \2"),
+    (re.compile(r"(\w+)\s?\/\s?(\w+)"), r"\1 or \2"),
+    (re.compile(r"\/"), r""),
+)
 
 
 def name_normalize(name: str) -> str:
-    name = re.sub(r'[?\\"%*:|<>]', "", name)
-    name = re.sub(r"( [w,W]\s?\/\s?[o,O,0])", r" without", name)
-    name = re.sub(r"( [w,W]\s?\/)", r" with", name)
-    name = re.sub(r"(\d+)\s?\/\s?(\d+)", r"\1 of \2", name)
-    name = re.sub(r"(\w+)\s?\/\s?(\w+)", r"\1 or \2", name)
-    name = re.sub(r"\/", r"", name)
+    for pattern, replacement in _NAME_NORMALIZE_SUBS:
+        name = pattern.sub(replacement, name)
 
     lang = settings.config["reddit"]["thread"]["post_lang"]
-    if lang:
+    if lang and _needs_translation(name, lang):
         print_substep("Translating filename...")
-        translated_name = translators.translate_text(name, translator="google", to_language=lang)
-        return translated_name
+        return _translate(name, lang)
     else:
         return name
 
 
-def prepare_background(reddit_id: str, W: int, H: int) -> str:
-    output_path = f"assets/temp/{reddit_id}/background_noaudio.mp4"
-    output = (
-        ffmpeg.input(f"assets/temp/{reddit_id}/background.mp4")
-        .filter("crop", f"ih*({W}/{H})", "ih")
-        .output(
-            output_path,
-            an=None,
-            **{
-                "c:v": "h264",
-                "b:v": "20M",
-                "b:a": "192k",
-                "threads": multiprocessing.cpu_count(),
-            },
-        )
-        .overwrite_output()
-    )
+def _needs_translation(name: str, lang: str) -> bool:
+    """An ASCII title is taken to be English already, and digits/symbols have nothing to translate."""
+    if not any(char.isalpha() for char in name):
+        return False
+    return not (lang.lower().startswith("en") and name.isascii())
+
+
+@functools.lru_cache(maxsize=256)
+def _translate(text: str, lang: str) -> str:
+    """Translates `text`, remembering results across runs in TRANSLATE_CACHE_PATH."""
     try:
-        output.run(quiet=True)
-    except ffmpeg.Error as e:
-        print(e.stderr.decode("utf8"))
-        exit(1)
-    return output_path
+        cache = read_json(TRANSLATE_CACHE_PATH)
+    except (FileNotFoundError, JSONDecodeError):
+        cache = {}
+    cached = cache.get(lang, {}).get(text)
+    if cached is not None:
+        return cached
+
+    translated = translators.translate_text(text, translator="google", to_language=lang)
+    cache.setdefault(lang, {})[text] = translated
+    TRANSLATE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    write_json(TRANSLATE_CACHE_PATH, cache)
+    return translated
+
+
+def probe_durations(paths: list[str]) -> dict[str, float]:
+    """Probes the duration of every file in `paths` in one batch.
+
+    Every ffprobe is its own process, so they are run side by side on a thread pool
+    instead of being spawned one after another while the filter graph is built.
+
+    Returns:
+        dict[str, float]: Duration in seconds, keyed by path
+    """
+    unique_paths = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=PROBE_MAX_WORKERS) as executor:
+        probes = executor.map(ffmpeg.probe, unique_paths)
+        return {path: float(probe["format"]["duration"]) for path, probe in zip(unique_paths, probes)}
+
+
+def probe_frame_rate(path: str) -> Fraction:
+    """Returns the frame rate of the first video stream in `path`, e.g. 30000/1001."""
+    probe = ffmpeg.probe(path, select_streams="v:0")
+    return Fraction(probe["streams"][0]["r_frame_rate"])
+
+
+def encoder_thread_args(x264_threads: int = X264_MAX_THREADS) -> dict:
+    """Returns the threading options for the picked encoder.
+
+    libx264 gets slower past about 8 frame threads, so it is capped instead of being given
+    every core; the rest of the cores go to parallel segments (see segment_jobs).
+    """
+    if h264_encoder_args()["c:v"] == SOFTWARE_H264_ENCODER:
+        return {"threads": 0, "x264-params": f"threads={x264_threads}:lookahead_threads=2"}
+    return {"threads": 0}
 
 
-def create_fancy_thumbnail(image, text, text_color, padding, wrap=35):
+@functools.lru_cache(maxsize=32)
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+def create_fancy_thumbnail(image, image_height, text, text_color, padding, wrap=35):
+    """Draws the title and channel name onto `image`, an ffmpeg stream of the title template.
+
+    The text is rendered by ffmpeg's drawtext filter inside the render itself; PIL only provides
+    the font metrics used to pick the font size and the line positions.
+
+    Args:
+        image_height (int): Height of the template in pixels, used to centre the text vertically
+    """
     print_step(f"Creating fancy thumbnail for: {text}")
-    font_title_size = 47
-    font = ImageFont.truetype(os.path.join("fonts", "Roboto-Bold.ttf"), font_title_size)
-    image_width, image_height = image.size
+    font_path = os.path.join("fonts", "Roboto-Bold.ttf")
     lines = textwrap.wrap(text, width=wrap)
-    y = (
-        (image_height / 2)
-        - (((getheight(font, text) + (len(lines) * padding) / len(lines)) * len(lines)) / 2)
-        + 30
-    )
-    draw = ImageDraw.Draw(image)
-
-    username_font = ImageFont.truetype(os.path.join("fonts", "Roboto-Bold.ttf"), 30)
-    draw.text(
-        (205, 825),
-        settings.config["settings"]["channel_name"],
-        font=username_font,
-        fill=text_color,
-        align="left",
+    font_title_size, extra_wrap, y_offset = FANCY_TITLE_LAYOUTS[min(len(lines), len(FANCY_TITLE_LAYOUTS) - 1)]
+    if extra_wrap:
+        lines = textwrap.wrap(text, width=wrap + extra_wrap)
+
+    image = image.drawtext(
+        text=settings.config["settings"]["channel_name"],
+        fontfile=font_path,
+        fontsize=30,
+        fontcolor=text_color,
+        x=205,
+        y=825,
     )
 
-    if len(lines) == 3:
-        lines = textwrap.wrap(text, width=wrap + 10)
-        font_title_size = 40
-        font = ImageFont.truetype(os.path.join("fonts", "Roboto-Bold.ttf"), font_title_size)
-        y = (
-            (image_height / 2)
-            - (((getheight(font, text) + (len(lines) * padding) / len(lines)) * len(lines)) / 2)
-            + 35
-        )
-    elif len(lines) == 4:
-        lines = textwrap.wrap(text, width=wrap + 10)
-        font_title_size = 35
-        font = ImageFont.truetype(os.path.join("fonts", "Roboto-Bold.ttf"), font_title_size)
-        y = (
-            (image_height / 2)
-            - (((getheight(font, text) + (len(lines) * padding) / len(lines)) * len(lines)) / 2)
-            + 40
-        )
-    elif len(lines) > 4:
-        lines = textwrap.wrap(text, width=wrap + 10)
-        font_title_size = 30
-        font = ImageFont.truetype(os.path.join("fonts", "Roboto-Bold.ttf"), font_title_size)
-        y = (
-            (image_height / 2)
-            - (((getheight(font, text) + (len(lines) * padding) / len(lines)) * len(lines)) / 2)
-            + 30
-        )
+    # Every line advances by the same font height, measured once
+    font = _load_font(font_path, font_title_size)
+    line_h = getheight(font, "Ay") + padding
+    y = (image_height / 2) - (line_h * len(lines)) / 2 + y_offset
 
     for line in lines:
-        draw.text((120, y), line, font=font, fill=text_color, align="left")
-        y += getheight(font, line) + padding
+        image = image.drawtext(
+            text=line,
+            fontfile=font_path,
+            fontsize=font_title_size,
+            fontcolor=text_color,
+            x=120,
+            y=int(y),
+        )
+        y += line_h
 
     return image
 
 
+def _ffconcat_path(path: str) -> str:
+    """Quotes an absolute path for an ffconcat `file` line."""
+    return "'" + Path(path).resolve().as_posix().replace("'", "'\\''") + "'"
+
+
+def find_screenshot(path_stem: str) -> str | None:
+    """Returns the screenshot saved for `path_stem` (a path without extension), PNG or JPEG, if any."""
+    for suffix in (".png", ".jpg"):
+        if exists(path_stem + suffix):
+            return path_stem + suffix
+    return None
+
+
+def fit_overlay(img_path: str, width: int, height: int, opacity: float | None) -> str:
+    """Scales an image to `width`, centres it on a transparent `width` x `height` canvas and multiplies its
+    alpha channel by `opacity`, so every frame of the overlay stream has the same size and format.
+
+    Returns:
+        str: The PNG written next to the image as `<stem>.overlay.png`; the original is left untouched,
+        so rendering the same folder again does not fade it twice
+    """
+    with Image.open(img_path) as img:
+        img = img.convert("RGBA")
+        scaled_height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, scaled_height), Image.LANCZOS)
+    if opacity is not None:
+        pixels = np.array(img)
+        alpha = pixels[..., 3]
+        np.multiply(alpha, opacity, out=alpha, casting="unsafe")
+        img = Image.fromarray(pixels)
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    canvas.paste(img, (0, (height - scaled_height) // 2))
+    output_path = str(Path(img_path).with_suffix(".overlay.png"))
+    canvas.save(output_path)
+    return output_path
+
+
+def overlay_centered(main, overlay, gpu: bool = False, **kwargs):
+    """Overlays `overlay` in the middle of `main`.
+
+    With `gpu` set, `main` must already be in CUDA memory; the overlay is uploaded and blended
+    with overlay_cuda, which has no timeline support, so it has to end by itself (eof_action=pass).
+    """
+    if gpu:
+        overlay = overlay.filter("format", "yuva420p").filter("hwupload_cuda")
+        return ffmpeg.filter([main, overlay], "overlay_cuda", x="(main_w-overlay_w)/2", y="(main_h-overlay_h)/2", **kwargs)
+    return main.overlay(overlay, x="(main_w-overlay_w)/2", y="(main_h-overlay_h)/2", **kwargs)
+
+
+def draw_background_credit(background_clip, background_config: Dict[str, Tuple]):
+    text = f"Background by {background_config['video'][2]}"
+    return ffmpeg.drawtext(
+        background_clip,
+        text=text,
+        x=f"(w-text_w)",
+        y=f"(h-text_h)",
+        fontsize=5,
+        fontcolor="White",
+        fontfile=os.path.join("fonts", "Roboto-Regular.ttf"),
+    )
+
+
+def fit_overlay_timeline(
+    timeline: list[tuple[str | None, float]],
+    start_time: float,
+    reddit_id: str,
+    screenshot_width: int,
+    opacity: float | None,
+) -> tuple[list[tuple[str, float]], str]:
+    """Fits every image of the timeline to one shared size (see fit_overlay) and fills the gaps with a blank.
+
+    A frame size change mid-stream would make ffmpeg rebuild the whole filter graph, audio included.
+
+    Args:
+        timeline (list[tuple[str | None, float]]): Image path (None leaves a gap) and seconds on screen
+        start_time (float): When the first image appears
+        opacity (float | None): Alpha multiplier baked into the images, None to leave them as they are
+
+    Returns:
+        tuple[list[tuple[str, float]], str]: The (image path, seconds) entries from t=0, and the blank image
+    """
+    image_paths = list(dict.fromkeys(img_path for img_path, _ in timeline if img_path))
+    # Tallest image once scaled to screenshot_width, rounded up to even for the yuv420 overlay formats
+    overlay_height = 2
+    for img_path in image_paths:
+        with Image.open(img_path) as img:  # only the header is read, for the size
+            overlay_height = max(overlay_height, round(img.height * screenshot_width / img.width))
+    overlay_height += overlay_height % 2
+
+    with ThreadPoolExecutor(max_workers=PROBE_MAX_WORKERS) as executor:
+        fitted_paths = dict(zip(
+            image_paths,
+            executor.map(lambda img_path: fit_overlay(img_path, screenshot_width, overlay_height, opacity), image_paths),
+        ))
+
+    blank_path = f"assets/temp/{reddit_id}/png/blank.png"
+    Image.new("RGBA", (screenshot_width, overlay_height), (0, 0, 0, 0)).save(blank_path)
+    entries = [(blank_path, start_time)]
+    entries += [(fitted_paths.get(img_path, blank_path), duration) for img_path, duration in timeline]
+    return entries, blank_path
+
+
+def slice_timeline(entries: list[tuple[str, float]], start: float, end: float | None) -> list[tuple[str, float]]:
+    """Returns the part of a (path, seconds) timeline between `start` and `end` (None for the end of it)."""
+    sliced = []
+    entry_start = 0.0
+    for img_path, duration in entries:
+        entry_end = entry_start + duration
+        clipped_start = max(entry_start, start)
+        clipped_end = entry_end if end is None else min(entry_end, end)
+        if clipped_end > clipped_start:
+            sliced.append((img_path, clipped_end - clipped_start))
+        entry_start = entry_end
+    return sliced
+
+
+def overlay_image_sequence(
+    background_clip,
+    entries: list[tuple[str, float]],
+    blank_path: str,
+    concat_path: Path,
+    gpu: bool = False,
+):
+    """Overlays a sequence of images on the background with a single overlay filter.
+
+    Chaining one `overlay(enable=between(t,a,b))` per image makes ffmpeg blend every frame through
+    every overlay. Instead the images are listed with their durations in an ffconcat file, read as
+    one stream that switches picture at each boundary, and blended once.
+
+    Args:
+        entries (list[tuple[str, float]]): Image path and seconds on screen, from fit_overlay_timeline
+        gpu (bool): Blend on the GPU, see overlay_centered
+    """
+    lines = ["ffconcat version 1.0"]
+    for img_path, duration in entries:
+        lines += [f"file {_ffconcat_path(img_path)}", f"duration {duration:.6f}"]
+    # The duration of the last entry is ignored, so end on a blank frame
+    lines.append(f"file {_ffconcat_path(blank_path)}")
+    concat_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    images = ffmpeg.input(str(concat_path), f="concat", safe=0)["v"]
+    return overlay_centered(background_clip, images, gpu=gpu, eof_action="pass")
+
+
+def _tee_escape(path: str) -> str:
+    """Escapes a file path for use inside a tee muxer output list."""
+    path = Path(path).as_posix()
+    for char in "\\'[]|":
+        path = path.replace(char, "\\" + char)
+    return path
+
+
+def segment_jobs(length: float) -> int:
+    """Returns how many segments to split a `length`-second libx264 render into, 1 for a single pass.
+
+    Only used when `render_in_segments` is on. Hardware encoders are left alone, they are already
+    fast and have a limited number of sessions.
+    """
+    if not settings.config["settings"].get("render_in_segments", False):
+        return 1
+    if h264_encoder_args()["c:v"] != SOFTWARE_H264_ENCODER:
+        return 1
+    jobs = min(SEGMENT_MAX_JOBS, multiprocessing.cpu_count() // SEGMENT_THREADS_PER_JOB)
+    return max(1, min(jobs, int(length // SEGMENT_MIN_SECONDS)))
+
+
+def render_segmented(
+    compose_video,
+    outputs: list[tuple[str, object]],
+    length: float,
+    frame_rate: Fraction,
+    jobs: int,
+    reddit_id: str,
+    on_update,
+) -> None:
+    """Encodes the video as `jobs` segments in parallel ffmpeg processes, then muxes the audio in.
+
+    Every segment builds its own graph for its slice of the timeline, so each process only decodes,
+    composites and encodes its own part. Segment boundaries fall on whole frames of `frame_rate` and
+    every segment but the last is cut to its exact frame count, so the stitched video neither drops
+    nor repeats frames at the seams. The video-only segments are joined with the concat demuxer
+    without re-encoding and each output gets its audio track encoded once.
+
+    Args:
+        compose_video (Callable[[float, float | None, int], object]): Builds the video stream for
+            (start, duration or None for the rest, segment index)
+        outputs (list[tuple[str, object]]): Output path and the audio stream to put in it
+        on_update (Callable[[float], None]): Called with the completed fraction as segments finish
+    """
+    segment_dir = Path(f"assets/temp/{reddit_id}/segments")
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    total_frames = round(length * frame_rate)
+    boundaries = [index * total_frames // jobs for index in range(jobs + 1)]
+    segment_args = {**h264_encoder_args(), **encoder_thread_args(SEGMENT_THREADS_PER_JOB)}
+
+    def encode_segment(index: int) -> str:
+        segment_path = str(segment_dir / f"segment{index}.mp4")
+        start = float(boundaries[index] / frame_rate)
+        if index == jobs - 1:
+            # The last segment runs to the end rather than stopping at a rounded length
+            segment = compose_video(start, None, index)
+            frame_args = {}
+        else:
+            frame_count = boundaries[index + 1] - boundaries[index]
+            # One spare frame of input, the output is cut to the exact count
+            segment = compose_video(start, float((frame_count + 1) / frame_rate), index)
+            frame_args = {"frames:v": frame_count}
+        ffmpeg.output(segment, segment_path, an=None, f="mp4", **frame_args, **segment_args).run(
+            quiet=True, overwrite_output=True
+        )
+        return segment_path
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(encode_segment, index) for index in range(jobs)]
+        for done, future in enumerate(futures, start=1):
+            future.result()
+            on_update(done / (jobs + 1))  # the final mux is the last step
+
+    concat_path = segment_dir / "segments.ffconcat"
+    concat_path.write_text(
+        "ffconcat version 1.0\n" + "".join(f"file {_ffconcat_path(f.result())}\n" for f in futures),
+        encoding="utf-8",
+    )
+    stitched_video = ffmpeg.input(str(concat_path), f="concat", safe=0)["v"]
+    ffmpeg.merge_outputs(
+        *(
+            ffmpeg.output(stitched_video, audio, path, f="mp4", **{"c:v": "copy", "b:a": "192k"})
+            for path, audio in outputs
+        )
+    ).run(quiet=True, overwrite_output=True)
+
+
 def merge_background_audio(audio: ffmpeg, reddit_id: str):
     """Gather an audio and merge with assets/backgrounds/background.mp3
     Args:
@@ -215,34 +486,32 @@ def make_final_video(
 
     print_step("Creating the final video 🎥")
 
-    background_clip = ffmpeg.input(prepare_background(reddit_id, W=W, H=H))
-
     # Gather all audio clips
-    audio_clips = list()
+    audio_paths = list()
     # number_of_clips from TTSEngine now refers to number of primary audio segments (sentences/comments)
 
     if storymode_enabled:
         if settings.config["settings"]["storymodemethod"] == 0:
             # Storymode Method 0: Title audio + single post audio (postaudio.mp3)
-            audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/title.mp3"))
+            audio_paths.append(f"assets/temp/{reddit_id}/mp3/title.mp3")
             if exists(f"assets/temp/{reddit_id}/mp3/postaudio.mp3"):
-                audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/postaudio.mp3"))
+                audio_paths.append(f"assets/temp/{reddit_id}/mp3/postaudio.mp3")
             else:
                 print_substep("Warning: postaudio.mp3 not found for storymode method 0.", style="yellow")
         
         elif settings.config["settings"]["storymodemethod"] == 1:
             # Storymode Method 1: Title audio + multiple audio_segment-N.mp3 files
-            audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/title.mp3"))
+            audio_paths.append(f"assets/temp/{reddit_id}/mp3/title.mp3")
             num_audio_segments = len(reddit_obj.get("audio_segments", []))
             for i in range(num_audio_segments):
-                audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/audio_segment-{i}.mp3"))
+                audio_paths.append(f"assets/temp/{reddit_id}/mp3/audio_segment-{i}.mp3")
 
     elif read_comment_as_story_enabled:
         # Read first comment as story: Title audio + multiple audio_segment-N.mp3 for the first comment
-        audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/title.mp3"))
+        audio_paths.append(f"assets/temp/{reddit_id}/mp3/title.mp3")
         num_audio_segments_comment = len(reddit_obj.get("audio_segments", [])) # These are sentences of the 1st comment
         for i in range(num_audio_segments_comment):
-            audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/audio_segment-{i}.mp3"))
+            audio_paths.append(f"assets/temp/{reddit_id}/mp3/audio_segment-{i}.mp3")
         # Note: The concatenated 0.mp3 for the first comment is used for the main audio track,
         # but the individual audio_segment-i.mp3 durations are needed for visual timing.
 
@@ -252,9 +521,13 @@ def make_final_video(
         if number_of_clips == 0:
              print("No audio clips to gather for standard mode (number_of_clips is 0).")
              # exit() or handle as error
-        audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/title.mp3"))
+        audio_paths.append(f"assets/temp/{reddit_id}/mp3/title.mp3")
         for i in range(number_of_clips): # Assumes 0.mp3, 1.mp3 ... exist
-            audio_clips.append(ffmpeg.input(f"assets/temp/{reddit_id}/mp3/{i}.mp3"))
+            audio_paths.append(f"assets/temp/{reddit_id}/mp3/{i}.mp3")
+
+    audio_clips = [ffmpeg.input(audio_path) for audio_path in audio_paths]
+    # Probe every clip's duration up front in one batch instead of one ffprobe at a time further down
+    audio_durations = probe_durations([audio_path for audio_path in audio_paths if exists(audio_path)])
 
     if not audio_clips:
         print_substep("CRITICAL: No audio clips were gathered. Video generation cannot proceed.", style="bold red")
@@ -266,200 +539,105 @@ def make_final_video(
     # We need to decide if audio_concat should use that, or concat title + audio_segments.
     # For simplicity and consistency with storymode method 1, let's concat title + audio_segments.
     # The final audio mix with background music will use this.
-    if audio_clips: # Ensure there are clips before attempting concat
-        audio_concat = ffmpeg.concat(*audio_clips, a=1, v=0)
-        ffmpeg.output(
-            audio_concat, f"assets/temp/{reddit_id}/audio.mp3", **{"b:a": "192k"}
-        ).overwrite_output().run(quiet=True)
-    else:
-        print_substep("No audio clips to concatenate for main audio track.", style="red")
-        # Handle error: perhaps create silent audio of `length`? For now, we might crash later.
+    # It is concatenated inside the final render's graph, not written to an intermediate file.
+    audio = ffmpeg.concat(*audio_clips, a=1, v=0)
+    only_tts_audio = None
+    if allowOnlyTTSFolder:
+        # The TTS track feeds both the background music mix and the OnlyTTS output
+        audio_split = audio.asplit()
+        audio, only_tts_audio = audio_split.stream(0), audio_split.stream(1)
+
+    # With NVENC and the CUDA filters the overlays and the final scale run on the GPU and the frames
+    # stay there until they are encoded
+    gpu_composite = cuda_composite_available()
 
     console.log(f"[bold green] Video Will Be: {length} Seconds Long")
 
     screenshot_width = int((W * 45) // 100)
-    audio = ffmpeg.input(f"assets/temp/{reddit_id}/audio.mp3")
     final_audio = merge_background_audio(audio, reddit_id)
 
-    image_clips = list()
-
     Path(f"assets/temp/{reddit_id}/png").mkdir(parents=True, exist_ok=True)
 
     # Credits to tim (beingbored)
     # get the title_template image and draw a text in the middle part of it with the title of the thread
-    title_template = Image.open("assets/title_template.png")
-
-    title = reddit_obj["thread_title"]
+    title_template_path = "assets/title_template.png"
+    with Image.open(title_template_path) as title_template:  # only the header is read, for the height
+        title_template_height = title_template.height
 
-    title = name_normalize(title)
+    # Own names, as `title` and `font_color` are reused for the file name and the thumbnail further down
+    title_text = name_normalize(reddit_obj["thread_title"])
+    title_font_color = "#000000"
+    title_padding = 5
 
-    font_color = "#000000"
-    padding = 5
+    # Built once and shared by every graph compose_video makes
+    title_image = create_fancy_thumbnail(
+        ffmpeg.input(title_template_path)["v"], title_template_height, title_text, title_font_color, title_padding
+    ).filter("scale", screenshot_width, -1)
 
-    # create_fancy_thumbnail(image, text, text_color, padding
-    title_img = create_fancy_thumbnail(title_template, title, font_color, padding)
-
-    title_img.save(f"assets/temp/{reddit_id}/png/title.png")
-    image_clips.insert(
-        0,
-        ffmpeg.input(f"assets/temp/{reddit_id}/png/title.png")["v"].filter(
-            "scale", screenshot_width, -1
-        ),
-    )
-
-    current_time = 0
     # Get title duration first
-    title_audio_duration = float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/title.mp3")["format"]["duration"])
-    background_clip = background_clip.overlay(
-        image_clips[0], # title.png
-        enable=f"between(t,0,{title_audio_duration})",
-        x="(main_w-overlay_w)/2",
-        y="(main_h-overlay_h)/2",
-    )
-    current_time += title_audio_duration
+    title_audio_duration = audio_durations[f"assets/temp/{reddit_id}/mp3/title.mp3"]
 
-    if storymode_enabled and settings.config["settings"]["storymodemethod"] == 1:
-        parsed_story_content = reddit_obj.get("parsed_story_content", [])
-        global_visual_chunk_idx = 0 # To index into the flat list of all visual chunks (img0.png, img1.png ...)
-        
-        for j, audio_segment_info in enumerate(parsed_story_content):
-            audio_segment_duration = float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/audio_segment-{j}.mp3")["format"]["duration"])
-            visual_chunks_for_this_audio_segment = audio_segment_info.get("visual_chunks", [])
-            num_visual_chunks = len(visual_chunks_for_this_audio_segment)
-
-            if num_visual_chunks == 0: continue # Should not happen if posttextparser is correct
-
-            time_per_visual_chunk = audio_segment_duration / num_visual_chunks
-
-            for vc_idx in range(num_visual_chunks):
-                # Load the corresponding visual chunk image (img0.png, img1.png, ...)
-                # These are already created by imagemaker based on the flat list from content["thread_post"]
-                img_path = f"assets/temp/{reddit_id}/png/img{global_visual_chunk_idx}.png"
-                if not exists(img_path):
-                    print_substep(f"Warning: Visual chunk image not found: {img_path}", style="yellow")
-                    current_time += time_per_visual_chunk # Still advance time
-                    global_visual_chunk_idx += 1
-                    continue
-                
-                # Add to image_clips list if not already (though it might be better to load on demand)
-                # For simplicity, let's assume they are pre-loaded if this path is taken or load them dynamically.
-                # Let's try dynamic loading here for overlay to avoid managing a large image_clips list index for visuals.
-                visual_chunk_image = ffmpeg.input(img_path)["v"].filter("scale", screenshot_width, -1)
-                
-                overlay_start_time = current_time
-                overlay_end_time = current_time + time_per_visual_chunk
-                
-                # Apply opacity filter only if the theme is not transparent
-                # (because if it is, imagemaker already made a transparent BG for the text)
-                processed_visual_chunk_image = visual_chunk_image
-                if settings.config["settings"]["theme"] != "transparent":
-                    processed_visual_chunk_image = visual_chunk_image.filter("colorchannelmixer", aa=opacity)
-
-                background_clip = background_clip.overlay(
-                    processed_visual_chunk_image,
-                    enable=f"between(t,{overlay_start_time},{overlay_end_time})",
-                    x="(main_w-overlay_w)/2",
-                    y="(main_h-overlay_h)/2",
-                )
-                current_time = overlay_end_time # Advance current time by the duration of this visual chunk
-                global_visual_chunk_idx += 1
+    # Everything shown after the title, as (image path or None for a gap, seconds on screen)
+    overlay_timeline = []
+    # Story chunks from imagemaker already have a transparent background on the transparent theme,
+    # screenshots always get the opacity
+    overlay_opacity = opacity if settings.config["settings"]["theme"] != "transparent" else None
 
-    elif read_comment_as_story_enabled:
-        # Similar logic for the first comment being read as a story
-        parsed_story_content = reddit_obj.get("parsed_story_content", []) # This is for the first comment
-        global_visual_chunk_idx = 0 
+    if (storymode_enabled and settings.config["settings"]["storymodemethod"] == 1) or read_comment_as_story_enabled:
+        # Story mode method 1, or the first comment read as a story: audio_segment-j.mp3 is the j-th sentence
+        # and its visual chunks (img0.png, img1.png, ... in one flat list) split its duration evenly
+        parsed_story_content = reddit_obj.get("parsed_story_content", [])
+        global_visual_chunk_idx = 0
 
         for j, audio_segment_info in enumerate(parsed_story_content):
-            # audio_segment-j.mp3 corresponds to the j-th sentence of the first comment
-            audio_segment_duration = float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/audio_segment-{j}.mp3")["format"]["duration"])
-            visual_chunks_for_this_audio_segment = audio_segment_info.get("visual_chunks", [])
-            num_visual_chunks = len(visual_chunks_for_this_audio_segment)
+            audio_segment_duration = audio_durations[f"assets/temp/{reddit_id}/mp3/audio_segment-{j}.mp3"]
+            num_visual_chunks = len(audio_segment_info.get("visual_chunks", []))
+            if num_visual_chunks == 0: continue # Should not happen if posttextparser is correct
 
-            if num_visual_chunks == 0: continue
             time_per_visual_chunk = audio_segment_duration / num_visual_chunks
-
-            for vc_idx in range(num_visual_chunks):
+            for _ in range(num_visual_chunks):
                 img_path = f"assets/temp/{reddit_id}/png/img{global_visual_chunk_idx}.png"
                 if not exists(img_path):
                     print_substep(f"Warning: Visual chunk image not found: {img_path}", style="yellow")
-                    current_time += time_per_visual_chunk
-                    global_visual_chunk_idx += 1
-                    continue
-                
-                visual_chunk_image = ffmpeg.input(img_path)["v"].filter("scale", screenshot_width, -1)
-                overlay_start_time = current_time
-                overlay_end_time = current_time + time_per_visual_chunk
-                
-                processed_visual_chunk_image_comment = visual_chunk_image
-                if settings.config["settings"]["theme"] != "transparent":
-                    processed_visual_chunk_image_comment = visual_chunk_image.filter("colorchannelmixer", aa=opacity)
-
-                background_clip = background_clip.overlay(
-                    processed_visual_chunk_image_comment,
-                    enable=f"between(t,{overlay_start_time},{overlay_end_time})",
-                    x="(main_w-overlay_w)/2",
-                    y="(main_h-overlay_h)/2",
-                )
-                current_time = overlay_end_time
+                    img_path = None # Still advance time
+                overlay_timeline.append((img_path, time_per_visual_chunk))
                 global_visual_chunk_idx += 1
 
     elif storymode_enabled and settings.config["settings"]["storymodemethod"] == 0:
-        # Storymode Method 0: Single post image (story_content.png) with its audio (postaudio.mp3)
-        if exists(f"assets/temp/{reddit_id}/mp3/postaudio.mp3") and exists(f"assets/temp/{reddit_id}/png/story_content.png"):
-            post_audio_duration = float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/postaudio.mp3")["format"]["duration"])
-            post_image = ffmpeg.input(f"assets/temp/{reddit_id}/png/story_content.png")["v"].filter("scale", screenshot_width, -1)
-            
-            overlay_start_time = current_time
-            overlay_end_time = current_time + post_audio_duration
-
-            processed_post_image = post_image
-            if settings.config["settings"]["theme"] != "transparent": # Though storymode method 0 usually uses dark/light actual screenshots
-                processed_post_image = post_image.filter("colorchannelmixer", aa=opacity)
-
-            background_clip = background_clip.overlay(
-                processed_post_image,
-                enable=f"between(t,{overlay_start_time},{overlay_end_time})",
-                x="(main_w-overlay_w)/2",
-                y="(main_h-overlay_h)/2",
-            )
-            current_time = overlay_end_time
+        # Storymode Method 0: Single post image (story_content.png or .jpg) with its audio (postaudio.mp3)
+        story_content_path = find_screenshot(f"assets/temp/{reddit_id}/png/story_content")
+        if exists(f"assets/temp/{reddit_id}/mp3/postaudio.mp3") and story_content_path:
+            overlay_timeline.append((
+                story_content_path,
+                audio_durations[f"assets/temp/{reddit_id}/mp3/postaudio.mp3"],
+            ))
         else:
             print_substep("Warning: Audio or image missing for storymode method 0.", style="yellow")
 
     else: # Standard comment screenshot mode
-        # This assumes 0.mp3, 1.mp3... and corresponding comment_ID.png exist
-        audio_clips_durations_standard = []
-        # number_of_clips is from TTS, should be count of actual comment audios (0.mp3, 1.mp3...)
+        # This assumes 0.mp3, 1.mp3... and corresponding comment_ID.png (or .jpg) exist
+        # Standard comments are screenshots, so opacity applies to the whole screenshot box
+        overlay_opacity = opacity
         for i in range(number_of_clips):
             audio_path = f"assets/temp/{reddit_id}/mp3/{i}.mp3"
-            if exists(audio_path):
-                audio_clips_durations_standard.append(float(ffmpeg.probe(audio_path)["format"]["duration"])) 
-            else:
+            if audio_path not in audio_durations:
                 print_substep(f"Warning: Comment audio {audio_path} not found.", style="yellow")
-                audio_clips_durations_standard.append(0) # Append 0 duration if audio missing
 
-        for i in range(number_of_clips):
             actual_comment_id = reddit_obj["comments"][i]["comment_id"]
-            img_path = f"assets/temp/{reddit_id}/png/{actual_comment_id}.png"
-            if not exists(img_path):
-                print_substep(f"Warning: Comment image not found: {img_path}", style="yellow")
-                current_time += audio_clips_durations_standard[i] # Advance time by audio duration even if image missing
-                continue
-
-            comment_image = ffmpeg.input(img_path)["v"].filter("scale", screenshot_width, -1)
-            overlay_start_time = current_time
-            overlay_end_time = current_time + audio_clips_durations_standard[i]
-
-            # Standard comments are screenshots, so opacity applies to the whole screenshot box
-            processed_comment_image = comment_image.filter("colorchannelmixer", aa=opacity)
-
-            background_clip = background_clip.overlay(
-                processed_comment_image,
-                enable=f"between(t,{overlay_start_time},{overlay_end_time})",
-                x="(main_w-overlay_w)/2",
-                y="(main_h-overlay_h)/2",
-            )
-            current_time = overlay_end_time
+            img_path = find_screenshot(f"assets/temp/{reddit_id}/png/{actual_comment_id}")
+            if img_path is None:
+                print_substep(f"Warning: Comment image not found for comment {actual_comment_id}", style="yellow")
+                img_path = None # Advance time by audio duration even if image missing
+            overlay_timeline.append((img_path, audio_durations.get(audio_path, 0)))
+
+    if overlay_timeline:
+        overlay_entries, blank_path = fit_overlay_timeline(
+            overlay_timeline,
+            start_time=title_audio_duration,
+            reddit_id=reddit_id,
+            screenshot_width=screenshot_width,
+            opacity=overlay_opacity,
+        )
 
     title = re.sub(r"[^\w\s-]", "", reddit_obj["thread_title"])
     idx = re.sub(r"[^\w\s-]", "", reddit_obj["thread_id"])
@@ -498,10 +676,8 @@ def make_final_video(
             )
             os.makedirs(f"./results/{subreddit}/thumbnails")
         # get the first file with the .png extension from assets/backgrounds and use it as a background for the thumbnail
-        first_image = next(
-            (file for file in os.listdir("assets/backgrounds") if file.endswith(".png")),
-            None,
-        )
+        with os.scandir("assets/backgrounds") as entries:
+            first_image = next((entry.name for entry in entries if entry.name.endswith(".png")), None)
         if first_image is None:
             print_substep("No png files found in assets/backgrounds", "red")
 
@@ -523,20 +699,48 @@ def make_final_video(
             thumbnailSave.save(f"./assets/temp/{reddit_id}/thumbnail.png")
             print_substep(f"Thumbnail - Building Thumbnail in assets/temp/{reddit_id}/thumbnail.png")
 
-    text = f"Background by {background_config['video'][2]}"
-    background_clip = ffmpeg.drawtext(
-        background_clip,
-        text=text,
-        x=f"(w-text_w)",
-        y=f"(h-text_h)",
-        fontsize=5,
-        fontcolor="White",
-        fontfile=os.path.join("fonts", "Roboto-Regular.ttf"),
-    )
-    background_clip = background_clip.filter("scale", W, H)
-    print_step("Rendering the video 🎥")
-    from tqdm import tqdm
+    def compose_video(start: float = 0.0, duration: float | None = None, index: int = 0):
+        """Builds the video stream from `start` for `duration` seconds (None for the rest of it)."""
+        seek_args = {"ss": start} if start else {}
+        if duration is not None:
+            seek_args["t"] = duration
+        # Cropped inside the final graph, which scales to W x H anyway, instead of re-encoding it on its own first
+        background_clip = (
+            ffmpeg.input(f"assets/temp/{reddit_id}/background.mp4", **seek_args, **hwaccel_input_args())["v"]
+            .filter("crop", f"ih*({W}/{H})", "ih")
+        )
+        if gpu_composite:
+            # The credit is drawn on the CPU first on this path, as drawtext can't run on CUDA frames
+            background_clip = (
+                draw_background_credit(background_clip, background_config)
+                .filter("format", "yuv420p")
+                .filter("hwupload_cuda")
+            )
+
+        title_left = title_audio_duration - start
+        if title_left > 0:
+            if gpu_composite:
+                # Repeat the single title frame for the title's duration, then let the stream end
+                title_clip = title_image.filter("loop", loop=-1, size=1).filter("trim", duration=title_left)
+                background_clip = overlay_centered(background_clip, title_clip, gpu=True, eof_action="pass")
+            else:
+                background_clip = overlay_centered(background_clip, title_image, enable=f"between(t,0,{title_left})")
 
+        if overlay_timeline:
+            end = None if duration is None else start + duration
+            background_clip = overlay_image_sequence(
+                background_clip,
+                slice_timeline(overlay_entries, start, end),
+                blank_path,
+                Path(f"assets/temp/{reddit_id}/overlays{index}.ffconcat"),
+                gpu=gpu_composite,
+            )
+
+        if gpu_composite:
+            return background_clip.filter("scale_cuda", W, H)
+        return draw_background_credit(background_clip, background_config).filter("scale", W, H)
+
+    print_step("Rendering the video 🎥")
     pbar = tqdm(total=100, desc="Progress: ", bar_format="{l_bar}{bar}", unit=" %")
 
     def on_update_example(progress) -> None:
@@ -544,65 +748,59 @@ def make_final_video(
         old_percentage = pbar.n
         pbar.update(status - old_percentage)
 
-    with ProgressFfmpeg(length, on_update_example) as progress:
-        path = str(output_dir / f"{filename}.mp4") # Use the potentially modified filename
-        # path = (
-        #     path[:251] + ".mp4"
-        # )  # Prevent a error by limiting the path length, do not change this. # Path length check might need re-evaluation with counters
+    path = str(output_dir / f"{filename}.mp4") # Use the potentially modified filename
+    # path = (
+    #     path[:251] + ".mp4"
+    # )  # Prevent a error by limiting the path length, do not change this. # Path length check might need re-evaluation with counters
+    only_tts_path = str(only_tts_dir / f"{filename}.mp4") if allowOnlyTTSFolder else None # Use the potentially modified filename for OnlyTTS too
+    jobs = segment_jobs(length)
+    if jobs > 1:
+        print_substep(f"Rendering in {jobs} parallel segments 🎥")
+        outputs = [(path, final_audio)]
+        if allowOnlyTTSFolder:
+            print_substep("Rendering the Only TTS video from the same segments 🎥")
+            outputs.append((only_tts_path, only_tts_audio))
         try:
-            ffmpeg.output(
-                background_clip,
-                final_audio,
-                path,
-                f="mp4",
-                **{
-                    "c:v": "h264",
-                    "b:v": "20M",
-                    "b:a": "192k",
-                    "threads": multiprocessing.cpu_count(),
-                },
-            ).overwrite_output().global_args("-progress", progress.output_file.name).run(
-                quiet=True,
-                overwrite_output=True,
-                capture_stdout=False,
-                capture_stderr=False,
-            )
+            frame_rate = probe_frame_rate(f"assets/temp/{reddit_id}/background.mp4")
+            render_segmented(compose_video, outputs, length, frame_rate, jobs, reddit_id, on_update_example)
         except ffmpeg.Error as e:
             print(e.stderr.decode("utf8"))
             exit(1)
+    else:
+        encode_args = {
+            **h264_encoder_args(),
+            "b:a": "192k",
+            **encoder_thread_args(),
+        }
+        if allowOnlyTTSFolder:
+            print_substep("Rendering the Only TTS video in the same pass 🎥")
+            # The video is encoded once and the tee muxer writes it twice: with the mixed audio (a:0)
+            # to the main file and with the TTS-only audio (a:1) to the OnlyTTS file
+            output = ffmpeg.output(
+                compose_video(),
+                final_audio,
+                only_tts_audio,
+                f"[select=\\'v,a:0\\':f=mp4]{_tee_escape(path)}|[select=\\'v,a:1\\':f=mp4]{_tee_escape(only_tts_path)}",
+                f="tee",
+                flags="+global_header",
+                **encode_args,
+            )
+        else:
+            output = ffmpeg.output(compose_video(), final_audio, path, f="mp4", **encode_args)
+
+        process = output.global_args("-progress", "pipe:1", "-nostats").run_async(
+            pipe_stdout=True, pipe_stderr=True, overwrite_output=True
+        )
+        progress = ProgressFfmpeg(process, length, on_update_example)
+        progress.start()
+        stderr = process.stderr.read()
+        process.wait()
+        progress.join()
+        if process.returncode != 0:
+            print(stderr.decode("utf8"))
+            exit(1)
     old_percentage = pbar.n
     pbar.update(100 - old_percentage)
-    if allowOnlyTTSFolder:
-        path = str(only_tts_dir / f"{filename}.mp4") # Use the potentially modified filename for OnlyTTS too
-        # path = (
-        #     path[:251] + ".mp4"
-        # )  # Prevent a error by limiting the path length, do not change this.
-        print_step("Rendering the Only TTS Video 🎥")
-        with ProgressFfmpeg(length, on_update_example) as progress:
-            try:
-                ffmpeg.output(
-                    background_clip,
-                    audio,
-                    path,
-                    f="mp4",
-                    **{
-                        "c:v": "h264",
-                        "b:v": "20M",
-                        "b:a": "192k",
-                        "threads": multiprocessing.cpu_count(),
-                    },
-                ).overwrite_output().global_args("-progress", progress.output_file.name).run(
-                    quiet=True,
-                    overwrite_output=True,
-                    capture_stdout=False,
-                    capture_stderr=False,
-                )
-            except ffmpeg.Error as e:
-                print(e.stderr.decode("utf8"))
-                exit(1)
-
-        old_percentage = pbar.n
-        pbar.update(100 - old_percentage)
     pbar.close()
     save_data(subreddit, filename + ".mp4", title, idx, background_config["video"][2])
     print_step("Removing temporary files 🗑")
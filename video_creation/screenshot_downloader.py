@@ -1,20 +1,86 @@
-import json
+import asyncio
+import functools
 import re
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fnmatch import fnmatch
 from pathlib import Path
 from typing import Dict, Final
 
-import translators
-from playwright.sync_api import ViewportSize, sync_playwright
-from rich.progress import track
+# Error and TimeoutError are Playwright's; TimeoutError shadows the builtin in this module
+from playwright.async_api import (
+    BrowserContext,
+    Error,
+    Page,
+    Route,
+    TimeoutError,
+    ViewportSize,
+)
+from rich.progress import Progress
 
-from utils import settings
+from utils import playwright_pool, settings
 from utils.console import print_step, print_substep
-from utils.imagenarator import imagemaker
+from utils.imagenarator import comment_card, imagemaker
+from utils.json_io import read_json
 from utils.playwright import clear_cookie_by_name
 from utils.videos import save_data
 
 __all__ = ["get_screenshots_of_reddit_posts"]
 
+_ID_RE = re.compile(r"[^\w\s-]")
+
+
+@dataclass(frozen=True, slots=True)
+class ThemeSpec:
+    bgcolor: tuple[int, int, int, int]
+    txtcolor: tuple[int, int, int]
+    transparent: bool
+    cookie_key: str
+
+
+# Unknown themes fall back to light
+_THEMES: Dict[str, ThemeSpec] = {
+    "dark": ThemeSpec((33, 33, 36, 255), (240, 240, 240), False, "dark"),
+    # Transparent background with white text, good for placing over dark video. Reddit's dark mode
+    # (white text) is used for the same reason, assuming the video might have dark parts.
+    "transparent": ThemeSpec((0, 0, 0, 0), (255, 255, 255), True, "dark"),
+    "light": ThemeSpec((255, 255, 255, 255), (0, 0, 0), False, "light"),
+}
+
+# Keyed by ThemeSpec.cookie_key
+_COOKIE_FILES = {
+    "dark": "./video_creation/data/cookie-dark-mode.json",
+    "light": "./video_creation/data/cookie-light-mode.json",
+}
+
+# Comment pages loaded and screenshotted side by side in the browser context
+COMMENT_SCREENSHOT_PAGES = 4
+DEFAULT_TIMEOUT_MS = 15_000
+# Opaque themes are saved as JPEG, which Chromium encodes and streams back much faster than PNG
+SCREENSHOT_JPEG_QUALITY = 90
+PROGRESS_UPDATES = 50
+RENDER_MAX_WORKERS = 8
+GET_COMMENT_JS = "id => document.getElementById('t1_' + id)"
+NAVIGATION_TIMEOUT_MS = 30_000
+# A navigation that hangs is retried a few times, the navigation timeout split between the attempts
+GOTO_ATTEMPTS = 3
+GOTO_ATTEMPT_TIMEOUT_MS = NAVIGATION_TIMEOUT_MS // GOTO_ATTEMPTS
+GOTO_MAX_BACKOFF_SECONDS = 8
+# Links and markdown images/links in a comment body; such comments are still screenshotted in the browser
+_MEDIA_RE = re.compile(r"https?://|\]\(|!\[", re.IGNORECASE)
+# Requests the screenshots don't need, aborted when `block_resources` is on (the default).
+# Stylesheets are kept so the layout matches the real page.
+BLOCKED_RESOURCE_TYPES = frozenset({"font", "websocket"})
+BLOCKED_URL_PATTERNS = (
+    "*doubleclick.net/*",
+    "*google-analytics.com/*",
+    "*googletagmanager.com/*",
+)
+# Also aborted, but only when nothing being screenshotted can show an image (no storymode post, no comment matching _MEDIA_RE)
+BLOCKED_MEDIA_RESOURCE_TYPES = frozenset({"image", "media"})
+BLOCKED_MEDIA_URL_PATTERNS = ("*redditstatic.com/avatars/*",)
+
 
 def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
     """Downloads screenshots of reddit posts as seen on the web. Downloads to assets/temp/png
@@ -24,39 +90,25 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
         screenshot_num (int): Number of screenshots to download
     """
     # settings values
-    W: Final[int] = int(settings.config["settings"]["resolution_w"])
-    H: Final[int] = int(settings.config["settings"]["resolution_h"])
+    settings_config = settings.config["settings"]
+    W: Final[int] = int(settings_config["resolution_w"])
+    H: Final[int] = int(settings_config["resolution_h"])
+    zoom: Final[float] = float(settings_config["zoom"])
     lang: Final[str] = settings.config["reddit"]["thread"]["post_lang"]
-    storymode: Final[bool] = settings.config["settings"]["storymode"]
-    read_comment_as_story: Final[bool] = settings.config["settings"]["read_comment_as_story"]
+    storymode: Final[bool] = settings_config["storymode"]
+    read_comment_as_story: Final[bool] = settings_config["read_comment_as_story"]
+    block_resources: Final[bool] = settings_config.get("block_resources", True)
 
     print_step("Downloading screenshots of reddit posts...")
-    reddit_id = re.sub(r"[^\w\s-]", "", reddit_object["thread_id"])
+    reddit_id = _ID_RE.sub("", reddit_object["thread_id"])
     # ! Make sure the reddit screenshots folder exists
     Path(f"assets/temp/{reddit_id}/png").mkdir(parents=True, exist_ok=True)
 
-    # set the theme and disable non-essential cookies
-    if settings.config["settings"]["theme"] == "dark":
-        cookie_file = open("./video_creation/data/cookie-dark-mode.json", encoding="utf-8")
-        bgcolor = (33, 33, 36, 255)
-        txtcolor = (240, 240, 240)
-        transparent = False
-    elif settings.config["settings"]["theme"] == "transparent":
-        # Always use transparent background if theme is transparent
-        bgcolor = (0, 0, 0, 0)  # RGBA for fully transparent
-        txtcolor = (255, 255, 255) # White text, good for placing over dark video
-        transparent = True
-        # Use dark mode cookies because Reddit's dark mode (white text)
-        # will be more visible when the screenshot/image is overlayed
-        # on a video, assuming the video might have dark parts.
-        cookie_file = open("./video_creation/data/cookie-dark-mode.json", encoding="utf-8")
-    else:
-        cookie_file = open("./video_creation/data/cookie-light-mode.json", encoding="utf-8")
-        bgcolor = (255, 255, 255, 255)
-        txtcolor = (0, 0, 0)
-        transparent = False
-
-    if (storymode and settings.config["settings"]["storymodemethod"] == 1) or \
+    # set the theme
+    theme = _THEMES.get(settings_config["theme"], _THEMES["light"])
+
+    # Story images are drawn locally by imagemaker, no browser or cookies needed
+    if (storymode and settings_config["storymodemethod"] == 1) or \
        (not storymode and read_comment_as_story):
         print_substep("Generating images for story-style content...")
         if not isinstance(reddit_object.get("thread_post"), list):
@@ -66,45 +118,98 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
                 return 
         
         return imagemaker(
-            theme=bgcolor,
+            theme=theme.bgcolor,
             reddit_obj=reddit_object,
-            txtclr=txtcolor,
-            transparent=transparent,
+            txtclr=theme.txtcolor,
+            transparent=theme.transparent,
         )
 
-    screenshot_num_actual = screenshot_num
+    comments = [] if storymode else reddit_object["comments"][:screenshot_num]
+    if comments and settings_config.get("render_text_comments", False):
+        # The bodies are already known from the API, so text-only comments are drawn without the browser
+        comments = _render_text_comments(comments, reddit_id, theme, W)
+        if not comments:
+            print_step("Finished downloading screenshots.", style="bold green")
+            return
 
-    with sync_playwright() as p:
-        print_substep("Launching Headless Browser...")
+    route_handler = None
+    if block_resources:
+        block_media = not storymode and not any(_MEDIA_RE.search(comment["comment_body"]) for comment in comments)
+        route_handler = _request_blocker(block_media)
 
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36",
-            viewport=ViewportSize(width=W, height=H),
-            device_scale_factor=settings.config["settings"]["zoom"],
+    # disable non-essential cookies
+    storage_state = _load_storage_state(theme.cookie_key)
+    playwright_pool.run(
+        _screenshot_thread(
+            reddit_object,
+            reddit_id,
+            comments,
+            storage_state,
+            W,
+            H,
+            zoom,
+            lang,
+            storymode,
+            theme.transparent,
+            route_handler,
         )
-        cookies = json.load(cookie_file)
-        context.add_cookies(cookies)
-        page = context.new_page()
-        page.set_default_timeout(0)
+    )
+    print_step("Finished downloading screenshots.", style="bold green")
 
-        page.goto(reddit_object["thread_url"], wait_until="domcontentloaded", timeout=60000)
-        page.wait_for_timeout(1000)
 
-        if page.locator('[data-testid="content-gate"]').is_visible():
-            print_substep("Content gate found. Clicking...", style="yellow")
-            page.locator('[data-testid="content-gate"] button').click()
-            page.wait_for_timeout(1000) # Wait for gate to disappear
+async def _screenshot_thread(
+    reddit_object: dict,
+    reddit_id: str,
+    comments: list,
+    storage_state: dict,
+    W: int,
+    H: int,
+    zoom: float,
+    lang: str,
+    storymode: bool,
+    transparent: bool,
+    route_handler: Callable[[Route], Awaitable[None]] | None,
+) -> None:
+    """Screenshots the post (storymode) or the comments in a context of the shared headless browser."""
+    async with playwright_pool.acquire(
+        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.63 Safari/537.36",
+        viewport=ViewportSize(width=W, height=H),
+        device_scale_factor=zoom,
+        storage_state=storage_state,
+    ) as context:
+        if route_handler is not None:
+            await context.route("**/*", route_handler)
+        # Bounded so a dead comment is skipped instead of stalling the run; calls can still pass their own timeout
+        context.set_default_timeout(DEFAULT_TIMEOUT_MS)
+        context.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+        page = await context.new_page()
 
+        # Only wait for the response to commit, then for the content (or the gate in front of it) to render
+        await _goto(page, reddit_object["thread_url"])
         try:
-            if page.locator("button", has_text="See full image").is_visible(timeout=500): # Quick check
-                 page.locator("button", has_text="See full image").first.click()
-                 page.wait_for_timeout(500)
-        except:
-            print_substep("No 'See full image' button found or not clickable. Skipping...", style="dim")
+            await page.locator('[data-testid="content-gate"], main').first.wait_for(state="visible", timeout=10000)
+        except TimeoutError:
+            print_substep("Thread page content did not show up in time. Continuing anyway...", style="yellow")
+
+        # query_selector answers right away instead of polling like locator.is_visible
+        gate_button = await page.query_selector('[data-testid="content-gate"] button')
+        if gate_button:
+            print_substep("Content gate found. Clicking...", style="yellow")
+            await gate_button.click()
+            try:
+                await page.locator('[data-testid="content-gate"]').first.wait_for(state="hidden", timeout=5000)
+            except Error:
+                print_substep("Content gate is still shown. Continuing anyway...", style="yellow")
+
+        full_image_button = await page.query_selector('button:has-text("See full image")')
+        if full_image_button:
+            try:
+                await full_image_button.click(timeout=2000)
+            except Error:
+                print_substep("'See full image' button not clickable. Skipping...", style="dim")
 
 
-        if lang != "":
+        if lang:
             # This translation logic might need adjustment based on actual page structure
             # and if it's needed for title screenshots vs comment screenshots.
             # Assuming it's primarily for the main post content if storymode method 0
@@ -112,9 +217,11 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
             try:
                 # Example: Clicking a general translate button if available
                 translate_button_selector = '[aria-label="translate"], [data-translate-button]' # Placeholder
-                if page.locator(translate_button_selector).is_visible(timeout=1000):
-                    page.locator(translate_button_selector).click()
-                    page.wait_for_timeout(1000) # Wait for translation
+                # count() answers right away, the button is usually not there
+                translate_button = page.locator(translate_button_selector)
+                if await translate_button.count() > 0:
+                    await translate_button.first.click()
+                    await page.wait_for_timeout(1000) # Wait for translation
                     # Further steps to select specific language if needed
             except Exception as e:
                 print_substep(f"Could not find or click translate button: {e}", style="yellow")
@@ -125,48 +232,184 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
             # Ensure the main post body is visible and screenshot it
             post_body_selector = '[data-click-id="text"]' # Selector for the main text body of the post
             try:
-                page.locator(post_body_selector).first.wait_for(state="visible", timeout=10000)
-                page.locator(post_body_selector).first.screenshot(
-                    path=f"assets/temp/{reddit_id}/png/story_content.png"
-                )
-                print_substep(f"Saved story content screenshot to assets/temp/{reddit_id}/png/story_content.png", style="green")
+                await page.locator(post_body_selector).first.wait_for(state="visible", timeout=10000)
+                screenshot_args = _screenshot_args(f"assets/temp/{reddit_id}/png/story_content", transparent)
+                await page.locator(post_body_selector).first.screenshot(**screenshot_args)
+                print_substep(f"Saved story content screenshot to {screenshot_args['path']}", style="green")
             except Exception as e:
                 print_substep(f"Error taking screenshot for story_content.png: {e}", style="bold red")
 
         else:
             print_substep("Taking screenshots of comments...", style="green")
-            clear_cookie_by_name(context, ['loid','session_tracker','csv','edgebucket','token_v2','session','recent_srs'])
-            
-            comments_on_page = reddit_object["comments"][:screenshot_num_actual]
-            if not comments_on_page:
+            await clear_cookie_by_name(context, ['loid','session_tracker','csv','edgebucket','token_v2','session','recent_srs'])
+
+            if not comments:
                 print_substep("No comments to screenshot.", style="yellow")
+            else:
+                # Comments already rendered on the thread page are captured in place,
+                # only the rest (deeper in the thread) get a navigation of their own
+                remaining_comments = await _screenshot_comments_in_place(page, comments, reddit_id, transparent)
+                await page.close()
+                if remaining_comments:
+                    await _screenshot_comments(context, remaining_comments, reddit_id, transparent)
 
-            for idx, comment in enumerate(
-                track(
-                    comments_on_page,
-                    "Downloading comment screenshots...",
-                )
-            ):
-                comment_url = f"https://www.reddit.com{comment['comment_url']}"
-                comment_id_for_filename = comment['comment_id']
-                screenshot_path = f"assets/temp/{reddit_id}/png/{comment_id_for_filename}.png"
-                
-                print_substep(f"Navigating to comment: {comment_url}",-1)
-                try:
-                    page.goto(comment_url, wait_until="domcontentloaded", timeout=30000)
-                    page.wait_for_timeout(500)
-
-                    comment_selector = f"#t1_{comment_id_for_filename}"
-                    
-                    comment_element = page.locator(comment_selector).first
-                    comment_element.wait_for(state="visible", timeout=10000)
-                    
-                    comment_element.screenshot(path=screenshot_path)
-                    print_substep(f"Saved comment screenshot: {screenshot_path}", 1)
-
-                except Exception as e:
-                    print_substep(f"Failed to screenshot comment {comment_id_for_filename}: {e}", style="bold red")
-
-        print_substep("Closing Headless Browser.", style="green")
-        browser.close()
-    print_step("Finished downloading screenshots.", style="bold green")
+        print_substep("Closing the browser context.", style="green")
+
+
+@functools.cache
+def _load_storage_state(cookie_key: str) -> dict:
+    """Parses a theme's cookie file the first time a browser needs it.
+
+    Returned as a Playwright storage state, so the cookies arrive with the context instead of
+    through a separate add_cookies call.
+    """
+    return {"cookies": read_json(_COOKIE_FILES[cookie_key]), "origins": []}
+
+
+def _render_text_comments(comments: list, reddit_id: str, theme: ThemeSpec, width: int) -> list:
+    """Draws the comments whose body is only text as images, saved where their screenshots would be.
+
+    Returns:
+        list: The comments with links or media, which still need the browser
+    """
+    media_comments, text_comments = [], []
+    for comment in comments:
+        (media_comments if _MEDIA_RE.search(comment["comment_body"]) else text_comments).append(comment)
+
+    def render(comment: dict) -> None:
+        image = comment_card(comment["comment_body"], theme.bgcolor, theme.txtcolor, width)
+        path = _screenshot_args(f"assets/temp/{reddit_id}/png/{comment['comment_id']}", theme.transparent)["path"]
+        if theme.transparent:
+            image.save(path)
+        else:
+            image.convert("RGB").save(path, quality=SCREENSHOT_JPEG_QUALITY)
+
+    # Pillow releases the GIL while encoding, so the cards are drawn and saved side by side
+    with ThreadPoolExecutor(max_workers=RENDER_MAX_WORKERS) as executor:
+        list(executor.map(render, text_comments))
+    print_substep(f"Rendered {len(text_comments)} text-only comments without the browser.", style="green")
+    return media_comments
+
+
+def _batched_track(items, description: str, total: int):
+    """Like rich's track, but only redraws the bar every `total // PROGRESS_UPDATES` items."""
+    step = max(1, total // PROGRESS_UPDATES)
+    with Progress(transient=True) as progress:
+        task = progress.add_task(description, total=total)
+        for done, item in enumerate(items, start=1):
+            yield item
+            if done % step == 0 or done == total:
+                progress.update(task, completed=done)
+
+
+def _screenshot_args(path_stem: str, transparent: bool) -> dict:
+    """Returns the screenshot options for `path_stem` (a path without extension): PNG with the page
+    background left out for the transparent theme, JPEG otherwise."""
+    if transparent:
+        return {"path": f"{path_stem}.png", "omit_background": True}
+    return {"path": f"{path_stem}.jpg", "type": "jpeg", "quality": SCREENSHOT_JPEG_QUALITY}
+
+
+async def _goto(page: Page, url: str) -> None:
+    """Navigates until the response commits, retrying timeouts with exponential backoff (1s, 2s, ... up to
+    GOTO_MAX_BACKOFF_SECONDS). The last timeout is raised."""
+    for attempt in range(GOTO_ATTEMPTS):
+        try:
+            await page.goto(url, wait_until="commit", timeout=GOTO_ATTEMPT_TIMEOUT_MS)
+            return
+        except TimeoutError:
+            if attempt == GOTO_ATTEMPTS - 1:
+                raise
+            print_substep(f"Timed out loading {url}, retrying...", style="yellow")
+        await asyncio.sleep(min(GOTO_MAX_BACKOFF_SECONDS, 2**attempt))
+
+
+def _request_blocker(block_media: bool) -> Callable[[Route], Awaitable[None]]:
+    """Returns a route handler that aborts the requests the screenshots don't need, images and media
+    included only when `block_media` is set."""
+    resource_types = BLOCKED_RESOURCE_TYPES | BLOCKED_MEDIA_RESOURCE_TYPES if block_media else BLOCKED_RESOURCE_TYPES
+    url_patterns = BLOCKED_URL_PATTERNS + BLOCKED_MEDIA_URL_PATTERNS if block_media else BLOCKED_URL_PATTERNS
+
+    async def block_unneeded_requests(route: Route) -> None:
+        request = route.request
+        if request.resource_type in resource_types or any(fnmatch(request.url, pattern) for pattern in url_patterns):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    return block_unneeded_requests
+
+
+async def _screenshot_comments_in_place(page: Page, comments: list, reddit_id: str, transparent: bool) -> list:
+    """Screenshots the comments that are on the already loaded thread page.
+
+    Returns:
+        list: The comments that were not found there
+    """
+    missing_comments = []
+    for comment in _batched_track(comments, "Capturing comments on the thread page...", total=len(comments)):
+        comment_id_for_filename = comment['comment_id']
+        # One round trip for the element; the screenshot itself scrolls it into view and waits for it to be visible
+        handle = await page.evaluate_handle(GET_COMMENT_JS, comment_id_for_filename)
+        comment_element = handle.as_element()
+        if comment_element is None:
+            await handle.dispose()
+            missing_comments.append(comment)
+            continue
+
+        screenshot_args = _screenshot_args(f"assets/temp/{reddit_id}/png/{comment_id_for_filename}", transparent)
+        try:
+            await comment_element.screenshot(timeout=5000, **screenshot_args)
+            print_substep(f"Saved comment screenshot: {screenshot_args['path']}", 1)
+        except Error:
+            missing_comments.append(comment)
+        finally:
+            await comment_element.dispose()
+    return missing_comments
+
+
+async def _screenshot_comments(context: BrowserContext, comments: list, reddit_id: str, transparent: bool) -> None:
+    """Screenshots the comments on up to COMMENT_SCREENSHOT_PAGES pages at once.
+
+    Every comment is its own navigation, so while one page waits on the network the others render.
+    """
+    pages = asyncio.Queue()
+    for _ in range(min(COMMENT_SCREENSHOT_PAGES, len(comments))):
+        pages.put_nowait(await context.new_page())
+
+    async def screenshot_on_free_page(comment: dict) -> None:
+        page = await pages.get()
+        try:
+            await _screenshot_comment(page, comment, reddit_id, transparent)
+        finally:
+            pages.put_nowait(page)
+
+    tasks = [asyncio.ensure_future(screenshot_on_free_page(comment)) for comment in comments]
+    for finished in _batched_track(
+        asyncio.as_completed(tasks),
+        "Downloading comment screenshots...",
+        total=len(tasks),
+    ):
+        await finished
+
+
+async def _screenshot_comment(page: Page, comment: dict, reddit_id: str, transparent: bool) -> None:
+    comment_url = f"https://www.reddit.com{comment['comment_url']}"
+    comment_id_for_filename = comment['comment_id']
+    screenshot_args = _screenshot_args(f"assets/temp/{reddit_id}/png/{comment_id_for_filename}", transparent)
+
+    print_substep(f"Navigating to comment: {comment_url}",-1)
+    try:
+        # The wait for the comment element below is what the screenshot needs, not the whole document
+        await _goto(page, comment_url)
+
+        comment_selector = f"#t1_{comment_id_for_filename}"
+
+        comment_element = page.locator(comment_selector).first
+        await comment_element.wait_for(state="visible", timeout=10000)
+
+        await comment_element.screenshot(**screenshot_args)
+        print_substep(f"Saved comment screenshot: {screenshot_args['path']}", 1)
+
+    except Exception as e:
+        print_substep(f"Failed to screenshot comment {comment_id_for_filename}: {e}", style="bold red")